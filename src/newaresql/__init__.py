@@ -1,13 +1,124 @@
+import logging
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass
+from typing import Callable, Generator, Iterable
+
 import polars as pl
 
-from newaresql.bdf import MAPPINGS, convert
+from newaresql.aggregate import aggregate_cycles, aggregate_steps
+from newaresql.catalogue import Catalogue, filter_tests
+from newaresql.clone import Mirror
 from newaresql.connect import Connector, connect
-from newaresql.schemas import get_data_schema
-from newaresql.transform import extend_data, transform_aux, transform_main
+from newaresql.bdf import find_field
+from newaresql.schemas import get_data_columns
+from newaresql.transform import DataExtender, required_columns, transform_data
+
+logger = logging.getLogger(__name__)
+
+
+def _list_tests(
+    connector: Connector,
+    where: dict | None = None,
+    catalogue: Catalogue | None = None,
+) -> list[dict]:
+    if catalogue is not None:
+        catalogue.refresh(connector)
+        return catalogue.find(where).to_dicts()
+    return filter_tests(connector.get_tests(), where).to_dicts()
+
+
+def _fetch_data(
+    test: dict,
+    connector: Connector,
+    where: dict | None = None,
+    main_columns: list[str] | None = None,
+    aux_columns: list[str] | None = None,
+    max_workers: int = 2,
+    executor: Executor | None = None,
+    compact: bool = False,
+) -> tuple[pl.DataFrame, pl.DataFrame | None]:
+    """
+    Fetch main and aux data for a test.
+    The two queries are independent, and run concurrently on separate pooled connections unless max_workers is 1.
+    Aux data is not fetched when aux_columns is an empty list.
+    """
+    if aux_columns == []:
+        main = connector.get_main_data(
+            test, where=where, columns=main_columns, compact=compact
+        )
+        return main, None
+    if executor is None:
+        if max_workers <= 1:
+            main = connector.get_main_data(
+                test, where=where, columns=main_columns, compact=compact
+            )
+            aux = connector.get_aux_data(
+                test, where=where, columns=aux_columns, compact=compact
+            )
+            return main, aux
+        with ThreadPoolExecutor(max_workers=min(max_workers, 2)) as pool:
+            return _fetch_data(
+                test,
+                connector=connector,
+                where=where,
+                main_columns=main_columns,
+                aux_columns=aux_columns,
+                executor=pool,
+                compact=compact,
+            )
+
+    main_future = executor.submit(
+        connector.get_main_data,
+        test,
+        where=where,
+        columns=main_columns,
+        compact=compact,
+    )
+    aux_future = executor.submit(
+        connector.get_aux_data, test, where=where, columns=aux_columns, compact=compact
+    )
+    return main_future.result(), aux_future.result()
 
 
-def _list_tests(connector: Connector) -> list[dict]:
-    return connector.get_tests().to_dicts()
+def _resolve_columns(
+    test: dict,
+    version: str,
+    main_columns: list[str] | None = None,
+    aux_columns: list[str] | None = None,
+    fields: list[str] | None = None,
+) -> tuple[list[str], list[str]]:
+    """
+    Columns to fetch, by default all that are needed for the requested fields.
+    """
+    defaults = get_data_columns(version, test["dev_uid"])
+    if fields is None:
+        if main_columns is None:
+            main_columns = defaults["main"]
+        if aux_columns is None:
+            aux_columns = defaults["aux"]
+        return main_columns, aux_columns
+
+    unknown = [field for field in fields if find_field(field, "label") is None]
+    if unknown:
+        raise ValueError(f"Unknown fields: {unknown}")
+    required = required_columns(
+        [find_field(field, "label").bts for field in fields],  # ty:ignore[possibly-missing-attribute]
+        version,
+        test["dev_uid"],
+    )
+    required.add("seq_id")
+    if main_columns is None:
+        main_columns = [col for col in defaults["main"] if col in required]
+    if aux_columns is None:
+        aux_columns = defaults["aux"] if "test_tmp" in required else []
+    return main_columns, aux_columns
 
 
 def _get_data(
@@ -16,51 +127,149 @@ def _get_data(
     where: dict | None = None,
     main_columns: list[str] | None = None,
     aux_columns: list[str] | None = None,
+    fields: list[str] | None = None,
+    max_workers: int = 2,
+    executor: Executor | None = None,
+    max_points: int | None = None,
+    extrema: bool = False,
+    compact: bool = False,
 ):
 
-    if aux_columns is None:
-        aux_columns = ["auxchl_id", "seq_id", "test_tmp"]
-    if main_columns is None:
-        main_columns = list(
-            get_data_schema(connector.version, test["dev_uid"])["main"].keys()
+    version = connector.version
+    main_columns, aux_columns = _resolve_columns(
+        test, version, main_columns, aux_columns, fields
+    )
+
+    if max_points is not None:
+        main = connector.get_decimated_data(
+            test,
+            max_points,
+            where=where,
+            columns=main_columns,
+            extrema=extrema,
+            compact=compact,
+        )
+        aux = None
+        if aux_columns != []:
+            # aux data of the records kept in main data only
+            aux = connector.get_aux_data(
+                test,
+                where={**(where or {}), "seq_id": main["seq_id"].to_list()},
+                columns=aux_columns,
+                compact=compact,
+            )
+        return transform_data(
+            main, aux, version, test["dev_uid"], fields=fields, compact=compact
         )
-        main_columns.remove("test_tmp")
 
-    main = connector.get_main_data(test, where=where, columns=main_columns)
-    aux = connector.get_aux_data(test, where=where, columns=aux_columns)
+    main, aux = _fetch_data(
+        test,
+        connector=connector,
+        where=where,
+        main_columns=main_columns,
+        aux_columns=aux_columns,
+        max_workers=max_workers,
+        executor=executor,
+        compact=compact,
+    )
+    return transform_data(
+        main, aux, version, test["dev_uid"], fields=fields, compact=compact
+    )
 
-    main = transform_main(main, connector.version, test["dev_uid"])
-    if aux is not None:
-        aux = transform_aux(aux, connector.version, test["dev_uid"])
-    else:
-        aux = None
 
-    if aux is not None:
-        data = main.join(aux, on="seq_id", how="left")
-    else:
-        data = main.with_columns(auxchl_id=pl.lit(None), test_tmp=pl.lit(None))
-    data = extend_data(data)
+def _get_steps(
+    test: dict,
+    connector: Connector,
+    where: dict | None = None,
+    fields: list[str] | None = None,
+) -> pl.DataFrame:
 
-    columns = MAPPINGS.get(("bts", "label"))
-    if columns is None:
-        raise ValueError("Invalid mapping from 'bts' to 'label'")
+    version = connector.version
+    main_columns, aux_columns = _resolve_columns(test, version, fields=fields)
+    main = connector.get_step_data(
+        test, where=where, columns=main_columns
+    ).with_columns(step_count=pl.int_range(1, pl.len() + 1, dtype=pl.Int32))
+    aux = None
+    if aux_columns != []:
+        aux = connector.get_aux_data(
+            test,
+            where={"seq_id": main["seq_id"].to_list()},
+            columns=aux_columns,
+        )
+    return transform_data(
+        main, aux, version, test["dev_uid"], fields=fields, extend=False
+    )
 
-    return convert(data, src="bts", dst="label").select(columns.values())
+
+def _iter_data(
+    test: dict,
+    connector: Connector,
+    where: dict | None = None,
+    main_columns: list[str] | None = None,
+    aux_columns: list[str] | None = None,
+    fields: list[str] | None = None,
+    chunksize: int = 100000,
+) -> Generator[pl.DataFrame, None, None]:
+
+    version = connector.version
+    main_columns, aux_columns = _resolve_columns(
+        test, version, main_columns, aux_columns, fields
+    )
+    has_aux = (connector.make_aux_statement(test) is not None) and aux_columns != []
+
+    mains = connector.stream_main_data(
+        test, where=where, columns=main_columns, chunksize=chunksize, order_by="seq_id"
+    )
+    auxs = connector.stream_aux_data(
+        test,
+        where=where,
+        columns=aux_columns,
+        chunksize=chunksize,
+        order_by=["seq_id", "auxchl_id"],
+    )
+
+    extender = DataExtender()
+    # aux rows are buffered until the main chunk covering their seq_id arrives
+    buffer: pl.DataFrame | None = None
+    exhausted = not has_aux
+    for main in mains:
+        if main.is_empty():
+            continue
+        last = main["seq_id"][-1]
+        while not exhausted and (buffer is None or buffer["seq_id"][-1] <= last):
+            chunk = next(auxs, None)
+            if chunk is None:
+                exhausted = True
+            elif buffer is None:
+                buffer = chunk
+            else:
+                buffer = pl.concat([buffer, chunk])
+
+        aux = None
+        if buffer is not None:
+            aux = buffer.filter(pl.col("seq_id") <= last)
+            buffer = buffer.filter(pl.col("seq_id") > last)
+        yield transform_data(
+            main, aux, version, test["dev_uid"], extender=extender, fields=fields
+        )
 
 
 def list_tests(
     connector: Connector | None = None,
     credentials: dict[str, str | int | None] | None = None,
+    where: dict | None = None,
+    catalogue: Catalogue | None = None,
 ) -> list[dict]:
     """
-    List all availalbe tests as dictionaries
+    List all availalbe tests as dictionaries, optionally filtered by where, e.g. {"chl_id": 3}.
+    With a catalogue, the catalogue is refreshed incrementally and tests are looked up locally.
     """
     if connector is None:
         cred = credentials or {}
         with connect(**cred) as conn:  # ty:ignore[invalid-argument-type]
-            return _list_tests(connector=conn)
+            return _list_tests(connector=conn, where=where, catalogue=catalogue)
 
-    return _list_tests(connector=connector)
+    return _list_tests(connector=connector, where=where, catalogue=catalogue)
 
 
 def get_data(
@@ -70,10 +279,23 @@ def get_data(
     where: dict | None = None,
     main_columns: list[str] | None = None,
     aux_columns: list[str] | None = None,
+    fields: list[str] | None = None,
+    max_workers: int = 2,
+    executor: Executor | None = None,
+    max_points: int | None = None,
+    extrema: bool = False,
+    compact: bool = False,
 ):
     """
 
     Get data for a given test as a polars dataframe
+    Main and aux data are fetched concurrently, on an existing executor or a thread pool of max_workers.
+    Set max_workers=1 to fetch them one after the other.
+    fields selects BDF labels, e.g. ["Voltage / V", "Current / A"]. Only the raw columns needed for them are fetched.
+    max_points decimates the data on the server to about that many records, e.g. for plotting, keeping the first and last record of each step.
+    extrema also keeps the records holding the min and max voltage and current of each stretch of records decimated away.
+    compact fetches raw columns as narrower integers, and returns Step Type as an Enum, counters as UInt32,
+    and voltage, current and temperature as Float32, see transform.COMPACT.
     """
 
     if connector is None:
@@ -85,6 +307,12 @@ def get_data(
                 where=where,
                 main_columns=main_columns,
                 aux_columns=aux_columns,
+                fields=fields,
+                max_workers=max_workers,
+                executor=executor,
+                max_points=max_points,
+                extrema=extrema,
+                compact=compact,
             )
     return _get_data(
         test,
@@ -92,7 +320,212 @@ def get_data(
         where=where,
         main_columns=main_columns,
         aux_columns=aux_columns,
+        fields=fields,
+        max_workers=max_workers,
+        executor=executor,
+        max_points=max_points,
+        extrema=extrema,
+        compact=compact,
     )
 
 
-__all__ = ["connect", "list_tests", "get_data"]
+def get_steps(
+    test: dict,
+    connector: Connector | None = None,
+    credentials: dict[str, str | int | None] | None = None,
+    where: dict | None = None,
+    fields: list[str] | None = None,
+) -> pl.DataFrame:
+    """
+    Get the last record of each step of a test as a polars dataframe, labelled as by get_data.
+    Steps are reduced on the server, so only one record per step is transferred.
+    Integrals such as capacity and energy hold their end-of-step values, and Step Index holds the number of records in the step.
+    The result can be passed on to aggregate_cycles() for cycle integrals.
+    """
+
+    if connector is None:
+        cred = credentials or {}
+        with connect(**cred) as conn:  # ty:ignore[invalid-argument-type]
+            return _get_steps(test, connector=conn, where=where, fields=fields)
+    return _get_steps(test, connector=connector, where=where, fields=fields)
+
+
+def iter_data(
+    test: dict,
+    connector: Connector | None = None,
+    credentials: dict[str, str | int | None] | None = None,
+    where: dict | None = None,
+    main_columns: list[str] | None = None,
+    aux_columns: list[str] | None = None,
+    fields: list[str] | None = None,
+    chunksize: int = 100000,
+) -> Generator[pl.DataFrame, None, None]:
+    """
+    Stream data for a given test as labelled polars dataframes of about chunksize rows.
+    Main and aux data are streamed in seq_id order and aligned chunk by chunk, so memory use follows the chunk size rather than the test length.
+    Step count, step index and total time are carried across chunks with a DataExtender.
+    fields selects BDF labels, as for get_data.
+    """
+    if connector is None:
+        cred = credentials or {}
+        with connect(**cred) as conn:  # ty:ignore[invalid-argument-type]
+            yield from _iter_data(
+                test,
+                connector=conn,
+                where=where,
+                main_columns=main_columns,
+                aux_columns=aux_columns,
+                fields=fields,
+                chunksize=chunksize,
+            )
+        return
+    yield from _iter_data(
+        test,
+        connector=connector,
+        where=where,
+        main_columns=main_columns,
+        aux_columns=aux_columns,
+        fields=fields,
+        chunksize=chunksize,
+    )
+
+
+def scan_data(
+    test: dict,
+    connector: Connector | None = None,
+    mirror: Mirror | None = None,
+    chunksize: int = 100000,
+) -> pl.LazyFrame:
+    """
+    Scan data for a given test as a labelled polars LazyFrame.
+    Tests in the mirror are scanned from Parquet, others are streamed from the database in chunks when collected.
+    Selecting columns prunes what is read, e.g. only the raw columns needed for voltage.
+    """
+    if (mirror is not None) and (test in mirror):
+        entry = mirror.entry(test)
+        version = entry["version"]  # ty:ignore[not-subscriptable]
+        main, aux = mirror.scan_raw(test)
+    elif connector is not None:
+        version = connector.version
+        columns = get_data_columns(version, test["dev_uid"])
+        main = connector.scan_main_data(
+            test, columns=columns["main"], chunksize=chunksize
+        )
+        aux = connector.scan_aux_data(test, columns=columns["aux"], chunksize=chunksize)
+    else:
+        raise ValueError("Test is not in the mirror, and no connector was given")
+    return transform_data(main, aux, version, test["dev_uid"])
+
+
+@dataclass
+class Result:
+    """
+    Outcome of fetching a single test with get_many.
+    Attributes:
+        test (dict): The test, as listed by list_tests.
+        data (pl.DataFrame | None): The data, or None if fetching failed.
+        error (Exception | None): The exception raised while fetching, if any.
+        elapsed (float): Wall-clock time in seconds spent on the test.
+    """
+
+    test: dict
+    data: pl.DataFrame | None = None
+    error: Exception | None = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _get_result(test: dict, connector: Connector, **kwargs) -> Result:
+    start = time.perf_counter()
+    try:
+        data = _get_data(test, connector=connector, max_workers=1, **kwargs)
+    except Exception as e:
+        logger.warning(f"Failed to get data for test {test}: {e}")
+        return Result(test=test, error=e, elapsed=time.perf_counter() - start)
+    return Result(test=test, data=data, elapsed=time.perf_counter() - start)
+
+
+def _get_many(
+    tests: Iterable[dict],
+    connector: Connector,
+    max_workers: int,
+    on_result: Callable[[Result], None] | None,
+    **kwargs,
+) -> Generator[Result, None, None]:
+    tests = iter(tests)
+    pending: set[Future[Result]] = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        try:
+            while True:
+                # backpressure: only max_workers tests are in flight or waiting to be consumed
+                for test in tests:
+                    pending.add(pool.submit(_get_result, test, connector, **kwargs))
+                    if len(pending) >= max_workers:
+                        break
+                if not pending:
+                    return
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if on_result is not None:
+                        on_result(result)
+                    yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def get_many(
+    tests: Iterable[dict],
+    connector: Connector | None = None,
+    credentials: dict[str, str | int | None] | None = None,
+    max_workers: int = 4,
+    on_result: Callable[[Result], None] | None = None,
+    where: dict | None = None,
+    main_columns: list[str] | None = None,
+    aux_columns: list[str] | None = None,
+) -> Generator[Result, None, None]:
+    """
+    Get data for many tests concurrently, yielding a Result per test as it completes.
+    A failing test yields a Result with the error, and does not stop the others.
+    At most max_workers tests are fetched or held in memory at once, so consume results as they arrive.
+    When credentials are used, the engine pool is sized to max_workers.
+    A connector passed by the caller should have a pool of at least max_workers connections.
+    """
+    kwargs = dict(where=where, main_columns=main_columns, aux_columns=aux_columns)
+    if connector is None:
+        cred = credentials or {}
+        with connect(  # ty:ignore[invalid-argument-type]
+            **cred,
+            engine_options={"pool_size": max_workers, "max_overflow": 0},
+        ) as conn:
+            yield from _get_many(tests, conn, max_workers, on_result, **kwargs)
+        return
+    yield from _get_many(tests, connector, max_workers, on_result, **kwargs)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Entry point of the neware-sql command line tool, see cli.py.
+    """
+    from newaresql.cli import run
+
+    return run(argv)
+
+
+__all__ = [
+    "connect",
+    "list_tests",
+    "get_data",
+    "get_many",
+    "get_steps",
+    "iter_data",
+    "scan_data",
+    "aggregate_steps",
+    "aggregate_cycles",
+    "Result",
+    "main",
+]
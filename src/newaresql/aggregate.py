@@ -0,0 +1,161 @@
+import logging
+from typing import Iterable
+
+import polars as pl
+
+from newaresql.bdf import FIELDS, Frame, find_field
+
+logger = logging.getLogger(__name__)
+
+STEP_KEY = "Step Count / 1"
+CYCLE_KEY = "Cycle Count / 1"
+
+CATEGORIES = {field.label: field.category for field in FIELDS}
+
+
+def _category(label: str) -> str | None:
+    field = find_field(label, "label")
+    return field.category if field is not None else None
+
+
+# reductions of each category into mergeable partial aggregates, and how partials are merged
+PARTIALS = {
+    "counter": {"first": "first"},
+    "time": {"first": "first", "last": "last"},
+    "timeseries": {"min": "min", "max": "max", "sum": "sum", "count": "sum"},
+    "integral": {"last": "last"},
+}
+
+
+def _name(label: str, agg: str) -> str:
+    return f"{label}\x00{agg}"
+
+
+def _columns(data: Frame) -> list[str]:
+    if isinstance(data, pl.LazyFrame):
+        return data.collect_schema().names()
+    return data.columns
+
+
+def _partial_steps(data: Frame) -> Frame:
+    """
+    Partial aggregates of each step in data, in order of appearance.
+    """
+    columns = _columns(data)
+    if STEP_KEY not in columns:
+        raise ValueError(
+            f"Step aggregation requires {STEP_KEY}, see transform.extend_data()"
+        )
+    exprs = []
+    for label in columns:
+        category = _category(label)
+        if label == STEP_KEY or category is None:
+            continue
+        col = pl.col(label)
+        reductions = {
+            "first": col.first(),
+            "last": col.last(),
+            "min": col.min(),
+            "max": col.max(),
+            "sum": col.sum(),
+            "count": col.count(),
+        }
+        exprs.extend(
+            reductions[agg].alias(_name(label, agg)) for agg in PARTIALS[category]
+        )
+    return data.group_by(STEP_KEY, maintain_order=True).agg(exprs)
+
+
+def _merge(partials: Frame, by: str) -> Frame:
+    """
+    Merge partial aggregates sharing the same key, e.g. of a step split across chunks.
+    """
+    exprs = []
+    for name in _columns(partials):
+        if name == by:
+            continue
+        label, agg = name.split("\x00")
+        merge = PARTIALS[_category(label)][agg]  # ty:ignore[invalid-argument-type]
+        exprs.append(getattr(pl.col(name), merge)().alias(name))
+    return partials.group_by(by, maintain_order=True).agg(exprs)
+
+
+def _steps(data: Frame | Iterable[pl.DataFrame]) -> Frame:
+    """
+    Partial aggregates of each step, from a frame or from chunks in record order.
+    """
+    if isinstance(data, (pl.DataFrame, pl.LazyFrame)):
+        return _partial_steps(data)
+    partials = [_partial_steps(chunk) for chunk in data]
+    if not partials:
+        raise ValueError("No data to aggregate")
+    return _merge(pl.concat(partials, how="vertical_relaxed"), STEP_KEY)
+
+
+def _finalize(partials: Frame, by: str, rename: dict[str, str] | None = None) -> Frame:
+    """
+    Turn partial aggregates into labelled columns.
+    """
+    rename = rename or {}
+    exprs = [pl.col(by)]
+    for name in _columns(partials):
+        if name == by:
+            continue
+        label, agg = name.split("\x00")
+        category = _category(label)
+        if category == "counter" or category == "integral":
+            exprs.append(pl.col(name).alias(rename.get(label, label)))
+        elif category == "time":
+            prefix = "Start" if agg == "first" else "End"
+            exprs.append(pl.col(name).alias(f"{prefix} {label}"))
+        elif agg in ("min", "max"):
+            exprs.append(pl.col(name).alias(f"{agg.capitalize()} {label}"))
+        elif agg == "sum":
+            mean = pl.col(name) / pl.col(_name(label, "count"))
+            exprs.append(mean.alias(f"Mean {label}"))
+    return partials.select(exprs)
+
+
+def aggregate_steps(data: Frame | Iterable[pl.DataFrame]) -> Frame:
+    """
+    Aggregate labelled data, as returned by get_data(), to one row per step.
+    Each column is reduced according to the category of its field:
+    counters and integrals to their value at the start and end of the step respectively,
+    times to their start and end, and timeseries to their min, max and mean.
+    data may be an eager or lazy frame, or an iterable of chunks in record order, as returned by iter_data().
+    """
+    return _finalize(_steps(data), STEP_KEY)
+
+
+def aggregate_cycles(data: Frame | Iterable[pl.DataFrame]) -> Frame:
+    """
+    Aggregate labelled data, as returned by get_data(), to one row per cycle.
+    Integrals are summed over the steps of each cycle, times reduced to their start and end, and timeseries to their min, max and mean.
+    data may be an eager or lazy frame, or an iterable of chunks in record order, as returned by iter_data().
+    """
+    steps = _steps(data)
+    if CYCLE_KEY not in {name.split("\x00")[0] for name in _columns(steps)}:
+        raise ValueError(f"Cycle aggregation requires {CYCLE_KEY}")
+    exprs = []
+    for name in _columns(steps):
+        if name == STEP_KEY:
+            continue
+        label, agg = name.split("\x00")
+        category = _category(label)
+        if category == "counter":
+            continue
+        if category == "integral":
+            exprs.append(pl.col(name).sum())
+        else:
+            exprs.append(getattr(pl.col(name), PARTIALS[category][agg])())
+    cycles = (
+        steps.rename({_name(CYCLE_KEY, "first"): CYCLE_KEY})
+        .group_by(CYCLE_KEY, maintain_order=True)
+        .agg(exprs)
+    )
+    rename = {
+        label: label.replace("Step ", "Cycle ", 1)
+        for label, category in CATEGORIES.items()
+        if category == "integral" and label.startswith("Step ")
+    }
+    return _finalize(cycles, CYCLE_KEY, rename)
@@ -0,0 +1,292 @@
+import logging
+from typing import AsyncGenerator, Sequence
+
+import polars as pl
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.util import greenlet_spawn
+
+from newaresql.connect import (
+    CONNECTORS,
+    Connector,
+    Version0760Connector,
+    Version0800Connector,
+    _cast,
+    _get_credential,
+)
+from newaresql.schemas import get_data_schema
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncConnector:
+    """
+    Asyncio variant of Connector, on a SQLAlchemy async engine, e.g. with the aiomysql driver.
+    Statements are built, and metadata reflected, by a Connector sharing the async engine's sync facade,
+    run in a greenlet so that its I/O awaits the async driver instead of blocking the event loop.
+    Streams are async generators over server-side cursors.
+    """
+
+    connector_class: type[Connector] = Connector
+
+    def __init__(
+        self,
+        host: str | None = None,
+        port: int | str | None = None,
+        user: str | None = None,
+        password: str | None = None,
+        database: str | None = None,
+        cache_ttl: float | None = None,
+        engine: AsyncEngine | None = None,
+        url: sa.engine.URL | str | None = None,
+        engine_options: dict | None = None,
+    ):
+        """
+        Connect with explicit credentials (or BTS_* environment variables), a database URL, or an existing async engine.
+        Credentials connect with the aiomysql driver.
+        An engine passed by the caller is shared, and is not disposed by the connector.
+        """
+        if engine is not None:
+            self._engine = engine
+            self._owns_engine = False
+        else:
+            if url is None:
+                url = sa.URL.create(
+                    drivername="mysql+aiomysql",
+                    username=_get_credential(user, "user"),
+                    password=_get_credential(password, "password"),
+                    host=_get_credential(host, "host"),
+                    port=_get_credential(port, "port"),
+                    database=_get_credential(database, "database"),
+                )
+            self._engine = create_async_engine(url, **(engine_options or {}))
+            self._owns_engine = True
+        self._sync = self.connector_class(
+            engine=self._engine.sync_engine, cache_ttl=cache_ttl
+        )
+
+    @property
+    def engine(self) -> AsyncEngine:
+        return self._engine
+
+    @property
+    def sync(self) -> Connector:
+        """
+        The Connector building statements for this connector. Its I/O must run in greenlet_spawn.
+        """
+        return self._sync
+
+    @property
+    def url(self) -> sa.engine.URL:
+        return self._engine.url
+
+    @property
+    def database(self) -> str | None:
+        return self._engine.url.database
+
+    async def get_version(self) -> str:
+        return await greenlet_spawn(lambda: self._sync.version)
+
+    async def get_tables(self) -> list[str]:
+        return await greenlet_spawn(lambda: self._sync.tables)
+
+    async def refresh(self):
+        self._sync.refresh()
+        return
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.dispose()
+        return
+
+    async def query(
+        self,
+        query: str | sa.TextClause | sa.Selectable,
+        schema: dict | None = None,
+    ) -> pl.DataFrame:
+        """
+        Execute a query and return the results as a Polars DataFrame.
+        explicit schema may be provided to override the inferred schema
+        """
+        return await greenlet_spawn(self._sync.query, query, schema)
+
+    async def stream(
+        self,
+        query: str | sa.TextClause | sa.Selectable,
+        schema: dict | None = None,
+        chunksize: int = 100000,
+    ) -> AsyncGenerator[pl.DataFrame, None]:
+        """
+        Execute a query and stream the results as Polars DataFrames in chunks, from a server-side cursor.
+        explicit schema may be provided to override the inferred schema
+        """
+        if isinstance(query, str):
+            query = sa.text(query)
+        async with self._engine.connect() as conn:
+            result = await conn.stream(query)
+            columns = list(result.keys())
+            async for rows in result.partitions(chunksize):
+                data = pl.DataFrame(
+                    [tuple(row) for row in rows],
+                    schema=columns,
+                    orient="row",
+                    infer_schema_length=None,
+                )
+                yield _cast(data, schema)
+
+    async def get_table(
+        self,
+        table: str,
+        columns: str | Sequence[str] | None = None,
+        where: dict | None = None,
+    ) -> pl.DataFrame:
+        """
+        Get a table from the database as a Polars DataFrame.
+        """
+        return await greenlet_spawn(
+            self._sync.get_table, table, columns=columns, where=where
+        )
+
+    async def get_tests(self) -> pl.DataFrame:
+        return await greenlet_spawn(self._sync.get_tests)
+
+    async def get_main_data(
+        self,
+        test: dict,
+        where: dict | None = None,
+        columns: str | Sequence[str] | None = None,
+    ) -> pl.DataFrame:
+        return await greenlet_spawn(
+            self._sync.get_main_data, test, where=where, columns=columns
+        )
+
+    async def get_aux_data(
+        self,
+        test: dict,
+        where: dict | None = None,
+        columns: str | Sequence[str] | None = None,
+    ) -> pl.DataFrame | None:
+        return await greenlet_spawn(
+            self._sync.get_aux_data, test, where=where, columns=columns
+        )
+
+    async def _stream_data(
+        self,
+        kind: str,
+        test: dict,
+        where: dict | None,
+        columns: str | Sequence[str] | None,
+        chunksize: int,
+        order_by: str | Sequence[str] | None,
+    ) -> AsyncGenerator[pl.DataFrame, None]:
+        make_statement = (
+            self._sync.make_main_statement
+            if kind == "main"
+            else self._sync.make_aux_statement
+        )
+        # building a statement reflects its tables, which is I/O
+        stmt = await greenlet_spawn(
+            make_statement, test, where=where, columns=columns, order_by=order_by
+        )
+        if stmt is None:
+            return
+        if isinstance(columns, str):
+            columns = [columns]
+        version = await self.get_version()
+        schema = get_data_schema(version, test["dev_uid"])[kind]
+        if columns is not None:
+            schema = {k: v for k, v in schema.items() if k in columns}
+        async for chunk in self.stream(stmt, schema=schema, chunksize=chunksize):
+            yield chunk
+
+    async def stream_main_data(
+        self,
+        test: dict,
+        where: dict | None = None,
+        columns: str | Sequence[str] | None = None,
+        chunksize: int = 100000,
+        order_by: str | Sequence[str] | None = None,
+    ) -> AsyncGenerator[pl.DataFrame, None]:
+        async for chunk in self._stream_data(
+            "main", test, where, columns, chunksize, order_by
+        ):
+            yield chunk
+
+    async def stream_aux_data(
+        self,
+        test: dict,
+        where: dict | None = None,
+        columns: str | Sequence[str] | None = None,
+        chunksize: int = 100000,
+        order_by: str | Sequence[str] | None = None,
+    ) -> AsyncGenerator[pl.DataFrame, None]:
+        """
+        Stream auxiliary data for a test. Yields nothing if the test has no auxiliary data.
+        """
+        async for chunk in self._stream_data(
+            "aux", test, where, columns, chunksize, order_by
+        ):
+            yield chunk
+
+    async def dispose(self):
+        if self._owns_engine:
+            await self._engine.dispose()
+        return
+
+
+class AsyncVersion0760Connector(AsyncConnector):
+    connector_class = Version0760Connector
+
+
+class AsyncVersion0800Connector(AsyncConnector):
+    connector_class = Version0800Connector
+
+
+ASYNC_CONNECTORS: dict[str, type[AsyncConnector]] = {
+    "0760": AsyncVersion0760Connector,
+    "0800": AsyncVersion0800Connector,
+}
+
+
+async def connect_async(
+    host: str | None = None,
+    port: int | str | None = None,
+    user: str | None = None,
+    password: str | None = None,
+    database: str | None = None,
+    cache_ttl: float | None = None,
+    engine: AsyncEngine | None = None,
+    url: sa.engine.URL | str | None = None,
+    engine_options: dict | None = None,
+) -> AsyncConnector:
+    """
+    Connect to the database and return the async connector matching the BTS version.
+    The version is resolved on the same engine that the returned connector uses.
+    """
+
+    conn = AsyncConnector(
+        host=host,
+        port=port,
+        user=user,
+        password=password,
+        database=database,
+        cache_ttl=cache_ttl,
+        engine=engine,
+        url=url,
+        engine_options=engine_options,
+    )
+    try:
+        version = await conn.get_version()
+        if not version:
+            raise ValueError("Failed to determine BTS version")
+        if version not in ASYNC_CONNECTORS:
+            raise ValueError(f"Unsupported BTS version: {version}")
+    except Exception:
+        await conn.dispose()
+        raise
+
+    conn.__class__ = ASYNC_CONNECTORS[version]
+    conn._sync.__class__ = CONNECTORS[version]
+    return conn
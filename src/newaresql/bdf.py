@@ -1,11 +1,15 @@
 import logging
+import re
 from dataclasses import dataclass
-from typing import Literal
+from typing import Iterable, Literal, TypeVar
 
 import polars as pl
 
 logger = logging.getLogger(__name__)
 
+# conversions and transformations apply to eager and lazy frames alike
+Frame = TypeVar("Frame", pl.DataFrame, pl.LazyFrame)
+
 
 @dataclass
 class Field:
@@ -15,60 +19,95 @@ class Field:
         neware (str): The name of the column in the Neware database.
         label (str): The human-readable label for the column.
         code (str): The code representation for the column.
+        category (str): How the column is reduced by step and cycle aggregation.
+            "counter": counters and indexes, first value.
+            "time": timestamps, first and last value.
+            "timeseries": measurements, min, max and mean.
+            "integral": quantities accumulated within a step, last value of each step.
     """
 
     bts: str
     label: str
     code: str
+    category: Literal["counter", "time", "timeseries", "integral"]
 
 
 FIELDS = [
     # Counters and indexes
-    Field(bts="step_id", label="Step ID / 1", code="step_id"),
-    Field(bts="step_type", label="Step Type / 1", code="step_type"),
-    Field(bts="step_index", label="Step Index / 1", code="step_index"),
-    Field(bts="seq_id", label="Record Count / 1", code="record_count"),
-    Field(bts="step_count", label="Step Count / 1", code="step_count"),
-    Field(bts="cycle", label="Cycle Count / 1", code="cycle_count"),
+    Field(bts="step_id", label="Step ID / 1", code="step_id", category="counter"),
+    Field(bts="step_type", label="Step Type / 1", code="step_type", category="counter"),
+    Field(
+        bts="step_index", label="Step Index / 1", code="step_index", category="counter"
+    ),
+    Field(
+        bts="seq_id", label="Record Count / 1", code="record_count", category="counter"
+    ),
+    Field(
+        bts="step_count", label="Step Count / 1", code="step_count", category="counter"
+    ),
+    Field(bts="cycle", label="Cycle Count / 1", code="cycle_count", category="counter"),
     # Time data
-    Field(bts="unix_time", label="Unix Time / s", code="unix_time"),
-    Field(bts="test_atime", label="Time / datetime", code="time_datetime"),
-    Field(bts="test_time", label="Step Time / s", code="step_time"),
+    Field(bts="unix_time", label="Unix Time / s", code="unix_time", category="time"),
+    Field(
+        bts="test_atime", label="Time / datetime", code="time_datetime", category="time"
+    ),
+    # step time restarts with each step, like the integrals
+    Field(
+        bts="test_time", label="Step Time / s", code="step_time", category="integral"
+    ),
     # Timeseries data
-    Field(bts="test_vol", label="Voltage / V", code="voltage_volt"),
-    Field(bts="test_cur", label="Current / A", code="current_ampere"),
-    Field(bts="test_tmp", label="Temperature / degC", code="temperature_celsius"),
-    Field(bts="test_pow", label="Power / W", code="power_watt"),
+    Field(
+        bts="test_vol", label="Voltage / V", code="voltage_volt", category="timeseries"
+    ),
+    Field(
+        bts="test_cur",
+        label="Current / A",
+        code="current_ampere",
+        category="timeseries",
+    ),
+    Field(
+        bts="test_tmp",
+        label="Temperature / degC",
+        code="temperature_celsius",
+        category="timeseries",
+    ),
+    Field(bts="test_pow", label="Power / W", code="power_watt", category="timeseries"),
     # Integral data
     Field(
         bts="test_capchg",
         label="Step Charging Capacity / Ah",
         code="step_charging_capacity_ah",
+        category="integral",
     ),
     Field(
         bts="test_capdchg",
         label="Step Discharging Capacity / Ah",
         code="step_discharging_capacity_ah",
+        category="integral",
     ),
     Field(
         bts="test_engchg",
         label="Step Charging Energy / Wh",
         code="step_charging_energy_wh",
+        category="integral",
     ),
     Field(
         bts="test_engdchg",
         label="Step Discharging Energy / Wh",
         code="step_discharging_energy_wh",
+        category="integral",
     ),
     Field(
         bts="test_cap",
         label="Step Capacity / Ah",
         code="step_capacity_ah",
+        category="integral",
     ),
     Field(
         bts="test_eng",
         label="Step Energy / Wh",
         code="step_energy_wh",
+        category="integral",
     ),
 ]
 
@@ -79,14 +118,80 @@ MAPPINGS = {
     if src != dst
 }
 
+FIELDS_BY = {
+    kind: {getattr(field, kind): field for field in FIELDS}
+    for kind in ["bts", "code", "label"]
+}
+
+
+def numbered(name: str, channel: int, kind: Literal["bts", "code", "label"]) -> str:
+    """
+    Name of a field for one of several channels, e.g. of auxiliary data.
+    "test_tmp" becomes "test_tmp_1", "temperature_celsius" "temperature_celsius_1" and "Temperature / degC" "Temperature 1 / degC".
+    """
+    if kind == "label":
+        quantity, unit = name.rsplit(" / ", 1)
+        return f"{quantity} {channel} / {unit}"
+    return f"{name}_{channel}"
+
+
+def unnumbered(
+    name: str, kind: Literal["bts", "code", "label"]
+) -> tuple[str, int | None]:
+    """
+    Base name and channel of a numbered field name, the inverse of numbered().
+    Names that are not numbered fields are returned as is, with channel None.
+    """
+    if name in FIELDS_BY[kind]:
+        return name, None
+    if kind == "label":
+        match = re.fullmatch(r"(.*) (\d+) / (.*)", name)
+        base = f"{match[1]} / {match[3]}" if match else None
+    else:
+        match = re.fullmatch(r"(.*)_(\d+)", name)
+        base = match[1] if match else None
+    if match is None or base not in FIELDS_BY[kind]:
+        return name, None
+    return base, int(match[2])
+
+
+def find_field(name: str, kind: Literal["bts", "code", "label"]) -> Field | None:
+    """
+    Field of a column name, numbered or not, or None if the name is not a field.
+    """
+    return FIELDS_BY[kind].get(unnumbered(name, kind)[0])
+
+
+def expand(
+    names: Iterable[str],
+    available: Iterable[str],
+    kind: Literal["bts", "code", "label"] = "label",
+) -> list[str]:
+    """
+    Expand names of fields that are only available numbered, e.g. per aux channel, to their numbered names in channel order.
+    """
+    available = list(available)
+    channels: dict[str, list[tuple[int, str]]] = {}
+    for name in available:
+        base, channel = unnumbered(name, kind)
+        if channel is not None:
+            channels.setdefault(base, []).append((channel, name))
+    expanded = []
+    for name in names:
+        if name not in available and name in channels:
+            expanded.extend(numbered for _, numbered in sorted(channels[name]))
+        else:
+            expanded.append(name)
+    return expanded
+
 
 def convert(
-    data: pl.DataFrame,
+    data: Frame,
     src: Literal["bts", "code", "label"] = "bts",
     dst: Literal["bts", "code", "label"] = "label",
-) -> pl.DataFrame:
+) -> Frame:
     """
-    Convert the column names of a DataFrame.
+    Convert the column names of a DataFrame, including numbered names of channels, e.g. "test_tmp_1".
     src - source
     dst - destination
     Valid values for src and dst are: "bts", "code", "label"
@@ -103,4 +208,9 @@ def convert(
     mapping = MAPPINGS.get((src, dst))
     if mapping is None:
         raise ValueError(f"No mapping found for {src} to {dst}")
+    mapping = dict(mapping)
+    for name in data.collect_schema().names():
+        base, channel = unnumbered(name, src)
+        if channel is not None:
+            mapping[name] = numbered(mapping[base], channel, dst)
     return data.rename(mapping, strict=False)
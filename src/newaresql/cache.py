@@ -0,0 +1,187 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+import polars as pl
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ResultCacheStats:
+    """
+    Counters of a result cache.
+    Attributes:
+        hits (int): Number of queries served from the cache.
+        misses (int): Number of cacheable queries run against the database.
+        writes (int): Number of results written to the cache.
+        evictions (int): Number of results evicted to stay within max_bytes.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+
+class ResultWriter:
+    """
+    Writes the chunks of one result to a temporary directory, and publishes them to the cache on commit.
+    A result that is not committed, e.g. a stream that was not read to the end, is discarded.
+    """
+
+    def __init__(self, cache: "ResultCache", key: str):
+        self._cache = cache
+        self._key = key
+        self._tmp = cache.root / f".tmp-{uuid.uuid4().hex}"
+        self._tmp.mkdir()
+        self._parts = 0
+
+    def write(self, data: pl.DataFrame):
+        data.write_ipc(self._tmp / f"part-{self._parts:06d}.arrow", compression="lz4")
+        self._parts += 1
+        return
+
+    def commit(self):
+        self._cache._publish(self._key, self._tmp)
+        return
+
+    def abort(self):
+        shutil.rmtree(self._tmp, ignore_errors=True)
+        return
+
+
+class ResultCache:
+    """
+    On-disk cache of query results, as Arrow IPC files under root, one directory per result.
+    Results are keyed by a hash of the compiled SQL, the database URL, the BTS version, the backend and the schema,
+    see Connector.query() and Connector.stream().
+    The least recently used results are evicted when the cache grows beyond max_bytes.
+    Results of active tests, i.e. tests in the test table, are not cached unless cache_active is set.
+    """
+
+    def __init__(
+        self,
+        root: str | os.PathLike,
+        max_bytes: int | None = None,
+        cache_active: bool = False,
+    ):
+        self._root = Path(root)
+        self._root.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+        self._cache_active = cache_active
+        self._lock = threading.RLock()
+        self._stats = ResultCacheStats()
+        # results interrupted by a crash are never committed
+        for tmp in self._root.glob(".tmp-*"):
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    @property
+    def root(self) -> Path:
+        return self._root
+
+    @property
+    def max_bytes(self) -> int | None:
+        return self._max_bytes
+
+    @property
+    def cache_active(self) -> bool:
+        return self._cache_active
+
+    @property
+    def stats(self) -> ResultCacheStats:
+        with self._lock:
+            return ResultCacheStats(**vars(self._stats))
+
+    @property
+    def size(self) -> int:
+        """
+        Total size of cached results in bytes.
+        """
+        return sum(size for _, _, size in self._entries())
+
+    def __len__(self) -> int:
+        return len(self._entries())
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    def _entries(self) -> list[tuple[float, Path, int]]:
+        entries = []
+        for path in self._root.iterdir():
+            if not path.is_dir() or path.name.startswith("."):
+                continue
+            try:
+                size = sum(part.stat().st_size for part in path.iterdir())
+                entries.append((path.stat().st_mtime, path, size))
+            except FileNotFoundError:
+                continue
+        return entries
+
+    def get(self, key: str) -> list[Path] | None:
+        """
+        Parts of a cached result in order, or None on a miss.
+        """
+        path = self._root / key
+        with self._lock:
+            if not path.is_dir():
+                self._stats.misses += 1
+                return None
+            self._stats.hits += 1
+            # the directory mtime orders results for eviction
+            now = time.time()
+            os.utime(path, (now, now))
+            return sorted(path.glob("part-*.arrow"))
+
+    def writer(self, key: str) -> ResultWriter:
+        return ResultWriter(self, key)
+
+    def _publish(self, key: str, tmp: Path):
+        with self._lock:
+            try:
+                os.replace(tmp, self._root / key)
+            except OSError:
+                # written concurrently by another query
+                shutil.rmtree(tmp, ignore_errors=True)
+                return
+            self._stats.writes += 1
+            self._evict()
+        return
+
+    def _evict(self):
+        if self._max_bytes is None:
+            return
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if total <= self._max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            self._stats.evictions += 1
+            logger.debug(f"Evicted cached result {path.name}")
+        return
+
+    def invalidate(self, key: str):
+        """
+        Remove a cached result.
+        """
+        with self._lock:
+            shutil.rmtree(self._root / key, ignore_errors=True)
+        return
+
+    def clear(self):
+        """
+        Remove all cached results.
+        """
+        with self._lock:
+            for _, path, _ in self._entries():
+                shutil.rmtree(path, ignore_errors=True)
+        return
@@ -0,0 +1,170 @@
+import datetime
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+import polars as pl
+import sqlalchemy as sa
+
+from newaresql.connect import CONNECTORS, Connector
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+
+
+def filter_tests(tests: pl.DataFrame, where: dict | None = None) -> pl.DataFrame:
+    """
+    Filter a test list, with the where syntax of Connector.select_table().
+
+    where [str, condition]
+
+        - equality: {col: value}
+        - between: {col: (min, max)} inclusive
+        - bigger than: {col: (min, None)} inclusive
+        - smaller than: {col: (None, max)} inclusive
+        - in list: {col: [value1, value2, ...]}
+    """
+    if not where:
+        return tests
+    masks = []
+    for col, pred in where.items():
+        if isinstance(pred, tuple):
+            lo, hi = pred
+            if lo is not None:
+                masks.append(pl.col(col) >= lo)
+            if hi is not None:
+                masks.append(pl.col(col) <= hi)
+        elif isinstance(pred, list):
+            masks.append(pl.col(col).is_in(pred))
+        else:
+            masks.append(pl.col(col) == pred)
+    if not masks:
+        return tests
+    return tests.filter(*masks)
+
+
+class Catalogue:
+    """
+    Local Parquet catalogue of test metadata.
+    Each metadata table (test, h_test*, and test_note for BTS 0760) is stored as a Parquet file under root,
+    with a manifest of its row count and highest test_id at the last refresh.
+    A refresh only re-reads tables whose row count or highest test_id changed, and the active test table.
+    """
+
+    def __init__(self, root: str | os.PathLike):
+        self._root = Path(root)
+        self._root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._manifest = self._read_manifest()
+        self._tests: pl.DataFrame | None = None
+
+    @property
+    def root(self) -> Path:
+        return self._root
+
+    @property
+    def version(self) -> str | None:
+        """
+        BTS version of the catalogued database, or None if the catalogue was never refreshed.
+        """
+        return self._manifest.get("version")
+
+    @property
+    def refreshed(self) -> datetime.datetime | None:
+        refreshed = self._manifest.get("refreshed")
+        return datetime.datetime.fromisoformat(refreshed) if refreshed else None
+
+    def _read_manifest(self) -> dict:
+        path = self._root / MANIFEST
+        if not path.exists():
+            return {"tables": {}}
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_manifest(self):
+        path = self._root / MANIFEST
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self._manifest, f, indent=2)
+        os.replace(tmp, path)
+        return
+
+    def path(self, table: str) -> Path:
+        return self._root / f"{table}.parquet"
+
+    @staticmethod
+    def _state(connector: Connector, table: str) -> dict:
+        wrap = connector.wrap_table(table)
+        stmt = sa.select(
+            sa.func.count().label("rows"),
+            sa.func.max(wrap.c.test_id).label("test_id"),
+        ).select_from(wrap)
+        state = connector.query(stmt).row(0, named=True)
+        return {
+            "rows": int(state["rows"]),
+            "test_id": int(state["test_id"]) if state["test_id"] is not None else None,
+        }
+
+    def refresh(self, connector: Connector) -> dict[str, int]:
+        """
+        Bring the catalogue up to date with the database.
+        Returns the number of rows read from each table that was re-read.
+        """
+        version = connector.version
+        tables = connector.catalogue_tables()
+        read = {}
+        with self._lock:
+            if self._manifest.get("version") not in (None, version):
+                raise ValueError(
+                    f"Catalogue is version {self._manifest['version']}, database is version {version}"
+                )
+            self._manifest["version"] = version
+            known = self._manifest["tables"]
+            for table in tables:
+                state = self._state(connector, table)
+                # the active test table changes in place, so it is always re-read
+                if (
+                    table != "test"
+                    and known.get(table) == state
+                    and self.path(table).exists()
+                ):
+                    continue
+                data = connector.get_table(table)
+                data.write_parquet(self.path(table))
+                known[table] = state
+                read[table] = data.height
+            for table in set(known) - set(tables):
+                self.path(table).unlink(missing_ok=True)
+                del known[table]
+            self._manifest["order"] = tables
+            self._manifest["refreshed"] = datetime.datetime.now().isoformat()
+            self._write_manifest()
+            self._tests = None
+        logger.info(f"Refreshed test catalogue: {read}")
+        return read
+
+    @property
+    def tests(self) -> pl.DataFrame:
+        """
+        All catalogued tests, as returned by Connector.get_tests() at the last refresh.
+        """
+        with self._lock:
+            if self._tests is None:
+                if self.version is None:
+                    raise ValueError("Catalogue is empty, refresh it first")
+                tables = {
+                    table: pl.read_parquet(self.path(table))
+                    for table in self._manifest["order"]
+                }
+                self._tests = CONNECTORS[self.version].assemble_tests(tables)
+            return self._tests
+
+    def find(self, where: dict | None = None) -> pl.DataFrame:
+        """
+        Look up catalogued tests, e.g. {"chl_id": 3}, {"start_time": (start, end)} or {"barcode": [...]}.
+        See filter_tests() for the where syntax.
+        """
+        return filter_tests(self.tests, where)
@@ -0,0 +1,232 @@
+import datetime
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+import polars as pl
+
+from newaresql.connect import TEST_KEYS, Connector
+from newaresql.schemas import get_data_columns, get_data_schema
+from newaresql.transform import transform_data
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+
+
+class Mirror:
+    """
+    Local Parquet mirror of tests.
+    Raw main and aux data of each test are written as numbered Parquet parts under
+    root/dev_uid=<dev_uid>/unit_id=<unit_id>/chl_id=<chl_id>/test_id=<test_id>/.
+    A manifest keeps the BTS version and the highest seq_id mirrored for each test,
+    so that later syncs only fetch new rows.
+    """
+
+    def __init__(self, root: str | os.PathLike):
+        self._root = Path(root)
+        self._root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._manifest = self._read_manifest()
+
+    @property
+    def root(self) -> Path:
+        return self._root
+
+    @property
+    def tests(self) -> list[dict]:
+        """
+        Tests in the mirror, as stored at their last sync.
+        """
+        with self._lock:
+            return [dict(entry["test"]) for entry in self._manifest["tests"].values()]
+
+    def _read_manifest(self) -> dict:
+        path = self._root / MANIFEST
+        if not path.exists():
+            return {"tests": {}}
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_manifest(self):
+        path = self._root / MANIFEST
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self._manifest, f, indent=2)
+        os.replace(tmp, path)
+        return
+
+    @staticmethod
+    def key(test: dict) -> str:
+        return "-".join(str(test[key]) for key in TEST_KEYS)
+
+    def __contains__(self, test: dict) -> bool:
+        return self.key(test) in self._manifest["tests"]
+
+    def path(self, test: dict) -> Path:
+        """
+        Directory of a test in the mirror.
+        """
+        return self._root.joinpath(*(f"{key}={test[key]}" for key in TEST_KEYS))
+
+    def entry(self, test: dict) -> dict | None:
+        """
+        Manifest entry of a test, or None if the test is not mirrored.
+        """
+        with self._lock:
+            return self._manifest["tests"].get(self.key(test))
+
+    def parts(self, test: dict, kind: str) -> list[Path]:
+        """
+        Parquet parts of main or aux data for a test, in seq_id order.
+        """
+        return sorted(self.path(test).glob(f"{kind}-*.parquet"))
+
+    def _write_part(self, test: dict, kind: str, data: pl.DataFrame):
+        if data.is_empty():
+            return
+        with self._lock:
+            state = self._manifest["tests"][self.key(test)][kind]
+            path = self.path(test) / f"{kind}-{state['parts']:06d}.parquet"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            data.write_parquet(path)
+            state["parts"] += 1
+            state["rows"] += data.height
+            state["seq_id"] = data["seq_id"].max()
+            self._write_manifest()
+        return
+
+    def _sync_kind(
+        self, test: dict, connector: Connector, kind: str, chunksize: int
+    ) -> int:
+        with self._lock:
+            state = self._manifest["tests"][self.key(test)][kind]
+            rows = state["rows"]
+            where = None
+            if state["seq_id"] is not None:
+                where = {"seq_id": (state["seq_id"] + 1, None)}
+
+        columns = get_data_columns(connector.version, test["dev_uid"])[kind]
+        if kind == "main":
+            chunks = connector.stream_main_data(
+                test,
+                where=where,
+                columns=columns,
+                chunksize=chunksize,
+                order_by="seq_id",
+            )
+        else:
+            chunks = connector.stream_aux_data(
+                test,
+                where=where,
+                columns=columns,
+                chunksize=chunksize,
+                order_by=["seq_id", "auxchl_id"],
+            )
+
+        # rows of the last seq_id in a chunk are carried over, so that a part never splits a seq_id
+        carry: pl.DataFrame | None = None
+        for chunk in chunks:
+            if carry is not None:
+                chunk = pl.concat([carry, chunk])
+            if chunk.is_empty():
+                continue
+            last = chunk["seq_id"][-1]
+            carry = chunk.filter(pl.col("seq_id") == last)
+            self._write_part(test, kind, chunk.filter(pl.col("seq_id") < last))
+        if carry is not None:
+            self._write_part(test, kind, carry)
+
+        with self._lock:
+            return self._manifest["tests"][self.key(test)][kind]["rows"] - rows
+
+    def sync(
+        self, test: dict, connector: Connector, chunksize: int = 100000
+    ) -> dict[str, int]:
+        """
+        Mirror a test, fetching only rows above the highest seq_id already mirrored.
+        Returns the number of main and aux rows added.
+        """
+        version = connector.version
+        with self._lock:
+            entry = self._manifest["tests"].get(self.key(test))
+            if entry is None:
+                entry = {
+                    "version": version,
+                    "main": {"seq_id": None, "parts": 0, "rows": 0},
+                    "aux": {"seq_id": None, "parts": 0, "rows": 0},
+                }
+                self._manifest["tests"][self.key(test)] = entry
+            elif entry["version"] != version:
+                raise ValueError(
+                    f"Mirrored test {self.key(test)} is version {entry['version']}, database is version {version}"
+                )
+            entry["test"] = {
+                key: value
+                for key, value in test.items()
+                if key in TEST_KEYS or key.endswith("_table")
+            }
+            entry["has_aux"] = connector.make_aux_statement(test) is not None
+
+        added = {"main": self._sync_kind(test, connector, "main", chunksize)}
+        if entry["has_aux"]:
+            added["aux"] = self._sync_kind(test, connector, "aux", chunksize)
+        else:
+            added["aux"] = 0
+
+        with self._lock:
+            entry["synced"] = datetime.datetime.now().isoformat()
+            self._write_manifest()
+        logger.info(f"Synced test {self.key(test)}: {added}")
+        return added
+
+    def read_raw(self, test: dict) -> tuple[pl.DataFrame, pl.DataFrame | None]:
+        """
+        Read raw main and aux data of a mirrored test.
+        """
+        entry = self.entry(test)
+        if entry is None:
+            raise KeyError(f"Test {self.key(test)} is not mirrored")
+        columns = get_data_columns(entry["version"], test["dev_uid"])
+        schema = get_data_schema(entry["version"], test["dev_uid"])
+
+        def read_kind(kind: str) -> pl.DataFrame:
+            parts = self.parts(test, kind)
+            if parts:
+                return pl.read_parquet(parts)
+            return pl.DataFrame(
+                schema={col: schema[kind][col] for col in columns[kind]}
+            )
+
+        main = read_kind("main")
+        aux = read_kind("aux") if entry["has_aux"] else None
+        return main, aux
+
+    def scan_raw(self, test: dict) -> tuple[pl.LazyFrame, pl.LazyFrame | None]:
+        """
+        Scan raw main and aux data of a mirrored test.
+        """
+        entry = self.entry(test)
+        if entry is None:
+            raise KeyError(f"Test {self.key(test)} is not mirrored")
+        if not self.parts(test, "main") or (
+            entry["has_aux"] and not self.parts(test, "aux")
+        ):
+            main, aux = self.read_raw(test)
+            return main.lazy(), aux.lazy() if aux is not None else None
+
+        main = pl.scan_parquet(self.parts(test, "main"))
+        aux = pl.scan_parquet(self.parts(test, "aux")) if entry["has_aux"] else None
+        return main, aux
+
+    def read(self, test: dict) -> pl.DataFrame:
+        """
+        Read a mirrored test as a labelled polars dataframe, as returned by get_data.
+        """
+        entry = self.entry(test)
+        if entry is None:
+            raise KeyError(f"Test {self.key(test)} is not mirrored")
+        main, aux = self.read_raw(test)
+        return transform_data(main, aux, entry["version"], test["dev_uid"])
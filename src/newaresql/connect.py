@@ -1,17 +1,33 @@
 from __future__ import annotations
 
 import datetime
+import functools
+import importlib.util
 import logging
 import os
-from typing import Generator, Literal, Sequence, overload
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Generator, Iterator, Literal, Sequence, overload
 
 import polars as pl
 import sqlalchemy as sa
+from polars.io.plugins import register_io_source
 
-from newaresql.schemas import get_data_schema
+from newaresql.cache import ResultCache
+from newaresql.schemas import get_data_columns, get_data_schema
+from newaresql.transform import DataExtender, transform_data
 
 logger = logging.getLogger(__name__)
 
+# columns identifying a test
+TEST_KEYS = ["dev_uid", "unit_id", "chl_id", "test_id"]
+# main data columns aggregated by Connector.get_test_summaries()
+SUMMARY_COLUMNS = ["seq_id", "cycle", "step_id", "test_atime"]
+# main data columns whose extrema are kept by Connector.get_decimated_data()
+EXTREMA_COLUMNS = ["test_vol", "test_cur"]
+
 
 class MissingCredentialError(Exception):
     pass
@@ -37,6 +53,30 @@ def _get_credential(value: str | int | None, key: str) -> str | int:
     return value
 
 
+def _order_by(
+    stmt: sa.Select | sa.CompoundSelect, order_by: str | Sequence[str]
+) -> sa.Select | sa.CompoundSelect:
+    """
+    Order a select or union by column names of its result.
+    """
+    if isinstance(order_by, str):
+        order_by = [order_by]
+    return stmt.order_by(*(sa.literal_column(col) for col in order_by))
+
+
+@dataclass
+class CacheStats:
+    """
+    Hit and miss counters of a metadata cache.
+    Attributes:
+        hits (int): Number of lookups served from the cache.
+        misses (int): Number of lookups that required a round trip to the database.
+    """
+
+    hits: int = 0
+    misses: int = 0
+
+
 class Connector:
     def __init__(
         self,
@@ -45,25 +85,111 @@ class Connector:
         user: str | None = None,
         password: str | None = None,
         database: str | None = None,
+        cache_ttl: float | None = None,
+        engine: sa.engine.Engine | None = None,
+        url: sa.engine.URL | str | None = None,
+        engine_options: dict | None = None,
+        backend: str = "sqlalchemy",
+        result_cache: ResultCache | None = None,
     ):
+        """
+        Connect with explicit credentials (or BTS_* environment variables), a database URL, or an existing engine.
+        An engine passed by the caller is shared, and is not disposed by the connector.
+        engine_options are passed on to sa.create_engine, e.g. pool_size, and are ignored for an existing engine.
+        backend selects how query results are fetched, see BACKENDS.
+        Unavailable backends fall back to "sqlalchemy".
+        result_cache keeps main and aux data of finished tests on disk, see ResultCache.
+        """
 
-        self._host = _get_credential(host, "host")
-        self._port = _get_credential(port, "port")
-        self._user = _get_credential(user, "user")
-        self._password = _get_credential(password, "password")
-        self._database = _get_credential(database, "database")
-
-        self._url = sa.URL.create(
-            drivername="mysql+pymysql",
-            username=self._user,
-            password=self._password,
-            host=self._host,
-            port=self._port,
-            database=self._database,
-        )
-        self._engine = sa.create_engine(self._url)
+        if engine is not None:
+            self._engine = engine
+            self._url = engine.url
+            self._owns_engine = False
+        else:
+            if url is not None:
+                self._url = sa.make_url(url)
+            else:
+                self._url = sa.URL.create(
+                    drivername="mysql+pymysql",
+                    username=_get_credential(user, "user"),
+                    password=_get_credential(password, "password"),
+                    host=_get_credential(host, "host"),
+                    port=_get_credential(port, "port"),
+                    database=_get_credential(database, "database"),
+                )
+            self._engine = sa.create_engine(self._url, **(engine_options or {}))
+            self._owns_engine = True
+
+        self._host = self._url.host
+        self._port = self._url.port
+        self._user = self._url.username
+        self._password = self._url.password
+        self._database = self._url.database
+
+        if backend not in BACKENDS:
+            raise ValueError(
+                f"Unknown backend: {backend}. Valid values are: {list(BACKENDS)}"
+            )
+        if not BACKENDS[backend].available():
+            logger.warning(f"Backend {backend} is not available, using sqlalchemy")
+            backend = "sqlalchemy"
+        self._backend = backend
+        self._result_cache = result_cache
+
+        # metadata cache, see refresh()
+        self._cache_ttl = cache_ttl
+        self._cache_lock = threading.RLock()
+        self._cache_stats = {
+            "version": CacheStats(),
+            "tables": CacheStats(),
+            "table": CacheStats(),
+            "summary": CacheStats(),
+        }
+        self._reset_cache()
+        # summaries of finished tests never change, and outlive cache_ttl
+        self._summaries: dict[tuple, dict] = {}
+        return
+
+    def _reset_cache(self):
+        self._cache_time = time.monotonic()
+        self._version: str | None = None
+        self._table_names: list[str] | None = None
+        self._metadata = sa.MetaData()
+        self._wrapped: dict[str, sa.Table] = {}
+        return
+
+    def _check_cache(self):
+        if self._cache_ttl is None:
+            return
+        if time.monotonic() - self._cache_time > self._cache_ttl:
+            logger.debug("Metadata cache expired, refreshing")
+            self._reset_cache()
+        return
+
+    def refresh(self):
+        """
+        Invalidate the metadata cache, i.e. the BTS version, table names and reflected tables, and memoized test summaries.
+        The cache, except test summaries, is also invalidated automatically after cache_ttl seconds, if set.
+        """
+        with self._cache_lock:
+            self._reset_cache()
+            self._summaries.clear()
         return
 
+    @property
+    def cache_ttl(self) -> float | None:
+        return self._cache_ttl
+
+    @property
+    def cache_stats(self) -> dict[str, CacheStats]:
+        """
+        Hit and miss counters of the metadata cache, by kind of lookup.
+        """
+        return {
+            key: CacheStats(stats.hits, stats.misses)
+            for key, stats in self._cache_stats.items()
+        }
+
     @property
     def host(self) -> str:
         return self._host
@@ -88,13 +214,66 @@ class Connector:
     def url(self) -> sa.engine.URL:
         return self._url
 
+    @property
+    def backend(self) -> str:
+        return self._backend
+
+    @property
+    def result_cache(self) -> ResultCache | None:
+        return self._result_cache
+
+    def cacheable(self, test: dict) -> bool:
+        """
+        Whether query results for a test may be cached, i.e. a result cache is set,
+        and the test is finished, unless the cache also keeps active tests.
+        """
+        if self._result_cache is None:
+            return False
+        if self._result_cache.cache_active:
+            return True
+        return not self._is_active(test)
+
+    def _result_key(
+        self, query: str | sa.TextClause | sa.Selectable, schema: dict | None
+    ) -> str:
+        if isinstance(query, sa.TextClause):
+            sql = str(query)
+        elif not isinstance(query, str):
+            sql = self.compile_statement(query)
+        else:
+            sql = query
+        return ResultCache.key(
+            self._url.render_as_string(hide_password=True),
+            self.version,
+            self._backend,
+            repr(sorted((schema or {}).items(), key=lambda item: item[0])),
+            sql,
+        )
+
     @property
     def tables(self) -> list[str]:
-        with self._engine.connect() as conn:
-            return sa.inspect(conn).get_table_names()
+        with self._cache_lock:
+            self._check_cache()
+            if self._table_names is not None:
+                self._cache_stats["tables"].hits += 1
+                return list(self._table_names)
+            self._cache_stats["tables"].misses += 1
+            with self._engine.connect() as conn:
+                self._table_names = sa.inspect(conn).get_table_names()
+            return list(self._table_names)
 
     @property
     def version(self) -> str:
+        with self._cache_lock:
+            self._check_cache()
+            if self._version is not None:
+                self._cache_stats["version"].hits += 1
+                return self._version
+            self._cache_stats["version"].misses += 1
+            self._version = self._query_version()
+            return self._version
+
+    def _query_version(self) -> str:
         versions = (
             self.query("SELECT DISTINCT version FROM db_ver")
             .select("version")
@@ -133,8 +312,18 @@ class Connector:
     def wrap_table(self, table: str) -> sa.Table:
         """
         Wrap a table name from the database in a SQLAlchemy Table object.
+        Reflected tables are memoized on the connector's metadata cache.
         """
-        return sa.Table(table, sa.MetaData(), autoload_with=self._engine)
+        with self._cache_lock:
+            self._check_cache()
+            if table in self._wrapped:
+                self._cache_stats["table"].hits += 1
+                return self._wrapped[table]
+            self._cache_stats["table"].misses += 1
+            self._wrapped[table] = sa.Table(
+                table, self._metadata, autoload_with=self._engine
+            )
+            return self._wrapped[table]
 
     def get_table_schema(self, table: str) -> dict[str, type]:
         """
@@ -256,9 +445,11 @@ class Connector:
         test: dict,
         where: dict | None = None,
         columns: str | Sequence[str] | None = None,
+        order_by: str | Sequence[str] | None = None,
     ) -> sa.Selectable:
         """
         Make a SQLAlchemy statement to select main data for a test.
+        order_by orders the statement, across both tables in case of a union.
         """
         if test.get("main_second_table") is not None:
             stmt = self.select_union(
@@ -286,6 +477,8 @@ class Connector:
                     "test_id": test["test_id"],
                 },
             )
+        if order_by is not None:
+            stmt = _order_by(stmt, order_by)
         return stmt
 
     def make_aux_statement(
@@ -293,9 +486,11 @@ class Connector:
         test: dict,
         where: dict | None = None,
         columns: str | Sequence[str] | None = None,
+        order_by: str | Sequence[str] | None = None,
     ) -> sa.Selectable | None:
         """
         Make a SQLAlchemy statement to select auxiliary data for a test.
+        order_by orders the statement, across both tables in case of a union.
         """
         if (test.get("aux_first_table") is None) and (
             test.get("aux_second_table") is None
@@ -346,6 +541,8 @@ class Connector:
                     "test_id": test["test_id"],
                 },
             )
+        if (stmt is not None) and (order_by is not None):
+            stmt = _order_by(stmt, order_by)
         return stmt
 
     def make_main_query(
@@ -379,38 +576,71 @@ class Connector:
         self,
         query: str | sa.TextClause | sa.Selectable,
         schema: dict | None = None,
+        cache: bool = False,
     ) -> pl.DataFrame:
         """
         Execute a query and return the results as a Polars DataFrame.
         explicit schema may be provided to override the inferred schema
-        implements pl.read_database
+        runs on the connector's backend, by default pl.read_database
+        with cache, the result is read from and written to the connector's result cache, if set
         """
-
-        with self._engine.connect() as conn:
-            return pl.read_database(query, conn, schema_overrides=schema)
+        if not cache or self._result_cache is None:
+            return BACKENDS[self._backend].query(self, query, schema)
+
+        key = self._result_key(query, schema)
+        parts = self._result_cache.get(key)
+        if parts is not None:
+            try:
+                return pl.concat(
+                    [pl.read_ipc(part, memory_map=False) for part in parts],
+                    rechunk=False,
+                )
+            except FileNotFoundError:
+                logger.debug(f"Cached result {key} was evicted while read")
+        data = BACKENDS[self._backend].query(self, query, schema)
+        writer = self._result_cache.writer(key)
+        try:
+            writer.write(data)
+            writer.commit()
+        except Exception:
+            writer.abort()
+            raise
+        return data
 
     def stream(
         self,
         query: str | sa.TextClause | sa.Selectable,
         schema: dict | None = None,
         chunksize: int = 100000,
+        cache: bool = False,
     ) -> Generator[pl.DataFrame, None, None]:
         """
         Execute a query and stream the results as Polars DataFrames in chunks.
         explicit schema may be provided to override the inferred schema
-        implements pl.read_database
-
-        """
-        with self._engine.connect().execution_options(
-            stream_results=True, yield_per=chunksize
-        ) as conn:
-            yield from pl.read_database(
-                query,
-                conn,
-                iter_batches=True,
-                batch_size=chunksize,
-                schema_overrides=schema,
-            )
+        runs on the connector's backend, by default pl.read_database
+        with cache, chunks are read from the connector's result cache, if set,
+        or written to it once the stream has been read to the end
+
+        """
+        if not cache or self._result_cache is None:
+            yield from BACKENDS[self._backend].stream(self, query, schema, chunksize)
+            return
+
+        key = self._result_key(query, schema) + f"-{chunksize}"
+        parts = self._result_cache.get(key)
+        if parts is not None:
+            for part in parts:
+                yield pl.read_ipc(part, memory_map=False)
+            return
+        writer = self._result_cache.writer(key)
+        try:
+            for chunk in BACKENDS[self._backend].stream(self, query, schema, chunksize):
+                writer.write(chunk)
+                yield chunk
+        except BaseException:
+            writer.abort()
+            raise
+        writer.commit()
 
     def get_table(
         self,
@@ -437,12 +667,89 @@ class Connector:
         stmt = self.select_table(table, columns=columns, where=where)
         yield from self.stream(stmt, chunksize=chunksize)
 
+    def _partition(
+        self,
+        make_statement: Callable[..., sa.Selectable | None],
+        test: dict,
+        where: dict | None,
+        partitions: int,
+    ) -> list[tuple[int, int]] | None:
+        """
+        Split the seq_id range of a test into at most partitions contiguous inclusive (lo, hi) slices.
+        Returns None if the data cannot be partitioned, i.e. it is empty or where filters seq_id by value or list.
+        """
+        where = dict(where or {})
+        seq_id = where.pop("seq_id", (None, None))
+        if not isinstance(seq_id, tuple):
+            return None
+        if seq_id != (None, None):
+            where["seq_id"] = seq_id
+        stmt = make_statement(test, where=where, columns="seq_id")
+        if stmt is None:
+            return None
+        sub = stmt.subquery()
+        bounds = self.query(
+            sa.select(
+                sa.func.min(sub.c.seq_id).label("lo"),
+                sa.func.max(sub.c.seq_id).label("hi"),
+            )
+        )
+        lo, hi = bounds["lo"][0], bounds["hi"][0]
+        if lo is None or hi is None:
+            return None
+        lo, hi = int(lo), int(hi)
+        edges = [lo + (hi - lo + 1) * i // partitions for i in range(partitions + 1)]
+        return [(a, b - 1) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+    def _get_partitioned(
+        self,
+        get: Callable[..., pl.DataFrame | None],
+        make_statement: Callable[..., sa.Selectable | None],
+        test: dict,
+        where: dict | None,
+        columns: str | Sequence[str] | None,
+        partitions: int,
+    ) -> pl.DataFrame | None:
+        """
+        Fetch seq_id slices concurrently, one pooled connection each, and concatenate them in seq_id order.
+        """
+        slices = self._partition(make_statement, test, where, partitions)
+        if slices is None or len(slices) < 2:
+            return get(test, where=where, columns=columns)
+        logger.debug(f"Fetching {len(slices)} seq_id partitions: {slices}")
+        with ThreadPoolExecutor(max_workers=len(slices)) as pool:
+            parts = list(
+                pool.map(
+                    lambda part: get(
+                        test, where={**(where or {}), "seq_id": part}, columns=columns
+                    ),
+                    slices,
+                )
+            )
+        return pl.concat(parts, rechunk=False)
+
     def get_main_data(
         self,
         test: dict,
         where: dict | None = None,
         columns: str | Sequence[str] | None = None,
+        partitions: int = 1,
+        compact: bool = False,
     ) -> pl.DataFrame:
+        """
+        Get main data for a test.
+        With partitions > 1, the seq_id range is split into that many slices, fetched concurrently on separate connections.
+        With compact, raw columns are fetched as narrower types, see schemas.COMPACT.
+        """
+        if partitions > 1:
+            return self._get_partitioned(  # ty:ignore[invalid-return-type]
+                functools.partial(self.get_main_data, compact=compact),
+                self.make_main_statement,
+                test,
+                where,
+                columns,
+                partitions,
+            )
 
         stmt = self.make_main_statement(test, where=where, columns=columns)
 
@@ -450,10 +757,10 @@ class Connector:
             columns = [columns]
         if isinstance(columns, Sequence):
             columns = list(columns)
-        schema = get_data_schema(self.version, test["dev_uid"])["main"]
+        schema = get_data_schema(self.version, test["dev_uid"], compact)["main"]
         if columns is not None:
             schema = {k: v for k, v in schema.items() if k in columns}
-        data = self.query(stmt, schema=schema)
+        data = self.query(stmt, schema=schema, cache=self.cacheable(test))
         return data
 
     def get_aux_data(
@@ -461,7 +768,25 @@ class Connector:
         test: dict,
         where: dict | None = None,
         columns: str | Sequence[str] | None = None,
+        partitions: int = 1,
+        compact: bool = False,
     ) -> pl.DataFrame | None:
+        """
+        Get auxiliary data for a test, or None if the test has no auxiliary data.
+        With partitions > 1, the seq_id range is split into that many slices, fetched concurrently on separate connections.
+        With compact, raw columns are fetched as narrower types, as for get_main_data.
+        """
+        if partitions > 1:
+            if self.make_aux_statement(test) is None:
+                return None
+            return self._get_partitioned(
+                functools.partial(self.get_aux_data, compact=compact),
+                self.make_aux_statement,
+                test,
+                where,
+                columns,
+                partitions,
+            )
 
         stmt = self.make_aux_statement(test, where=where, columns=columns)
         if stmt is None:
@@ -471,29 +796,137 @@ class Connector:
             columns = [columns]
         if isinstance(columns, Sequence):
             columns = list(columns)
-        schema = get_data_schema(self.version, test["dev_uid"])["aux"]
+        schema = get_data_schema(self.version, test["dev_uid"], compact)["aux"]
         if columns is not None:
             schema = {k: v for k, v in schema.items() if k in columns}
-        data = self.query(stmt, schema=schema)
+        data = self.query(stmt, schema=schema, cache=self.cacheable(test))
         return data
 
+    def _paginate(
+        self,
+        make_statement: Callable[..., sa.Selectable | None],
+        test: dict,
+        where: dict | None,
+        columns: list[str] | None,
+        schema: dict,
+        chunksize: int,
+        order_by: list[str],
+        retries: int,
+        prefetch: bool,
+    ) -> Generator[pl.DataFrame, None, None]:
+        """
+        Stream pages of at most chunksize rows, each a separate query continuing from the last seq_id of the previous page.
+        A page never splits a seq_id, so rows sharing the last seq_id of a full page are fetched again with the next page.
+        Failed pages are retried up to retries times, resuming from the last seq_id.
+        With prefetch, the next page is fetched on a background thread while the current page is consumed.
+        """
+        where = dict(where or {})
+        seq_id = where.pop("seq_id", (None, None))
+        if not isinstance(seq_id, tuple):
+            raise ValueError(
+                "Paginated streams only support a (min, max) seq_id filter"
+            )
+        lo, hi = seq_id
+        cache = self.cacheable(test)
+        fetch_columns = None
+        if columns is not None:
+            # the order columns are needed to order a union, and seq_id to continue
+            fetch_columns = list(dict.fromkeys([*columns, *order_by]))
+            schema = {k: v for k, v in schema.items() if k in fetch_columns}
+
+        def fetch(start: int | None) -> pl.DataFrame:
+            page_where = dict(where)
+            if (start is not None) or (hi is not None):
+                page_where["seq_id"] = (start, hi)
+            stmt = make_statement(
+                test,
+                where=page_where,
+                columns=fetch_columns,
+                order_by=order_by,
+            ).limit(chunksize)  # ty:ignore[possibly-missing-attribute]
+            for attempt in range(retries + 1):
+                try:
+                    return self.query(stmt, schema=schema, cache=cache)
+                except Exception as e:
+                    if attempt == retries:
+                        raise
+                    logger.warning(
+                        f"Failed to fetch page from seq_id {start}, retrying ({attempt + 1}/{retries}): {e}"
+                    )
+            raise RuntimeError("unreachable")
+
+        def split(page: pl.DataFrame) -> tuple[pl.DataFrame, int | None]:
+            if page.height < chunksize:
+                return page, None
+            last = page["seq_id"][-1]
+            head = page.filter(pl.col("seq_id") < last)
+            if head.is_empty():
+                raise ValueError(
+                    f"More than {chunksize} rows share seq_id {last}, increase chunksize"
+                )
+            return head, last
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            start = lo
+            pending = pool.submit(fetch, start) if prefetch else None
+            while True:
+                page = pending.result() if pending is not None else fetch(start)
+                page, start = split(page)
+                if prefetch and start is not None:
+                    pending = pool.submit(fetch, start)
+                if columns is not None:
+                    page = page.select(columns)
+                yield page
+                if start is None:
+                    return
+
     def stream_main_data(
         self,
         test: dict,
         where: dict | None = None,
         columns: str | Sequence[str] | None = None,
         chunksize: int = 100000,
+        order_by: str | Sequence[str] | None = None,
+        paginate: bool = False,
+        retries: int = 0,
+        prefetch: bool = False,
     ) -> Generator[pl.DataFrame, None, None]:
+        """
+        Stream main data for a test in chunks.
+        By default the data is streamed from one server-side cursor.
+        With paginate, each chunk is a separate query ordered by seq_id and continuing from the previous chunk,
+        so no cursor is held open between chunks. Failed pages are retried up to retries times,
+        and prefetch fetches the next page in the background. A seq_id filter in where must be a (min, max) tuple.
+        """
 
-        stmt = self.make_main_statement(test, where=where, columns=columns)
         if isinstance(columns, str):
             columns = [columns]
         if isinstance(columns, Sequence):
             columns = list(columns)
         schema = get_data_schema(self.version, test["dev_uid"])["main"]
+
+        if paginate:
+            yield from self._paginate(
+                self.make_main_statement,
+                test,
+                where=where,
+                columns=columns,
+                schema=schema,
+                chunksize=chunksize,
+                order_by=["seq_id"],
+                retries=retries,
+                prefetch=prefetch,
+            )
+            return
+
+        stmt = self.make_main_statement(
+            test, where=where, columns=columns, order_by=order_by
+        )
         if columns is not None:
             schema = {k: v for k, v in schema.items() if k in columns}
-        yield from self.stream(stmt, chunksize=chunksize, schema=schema)
+        yield from self.stream(
+            stmt, chunksize=chunksize, schema=schema, cache=self.cacheable(test)
+        )
 
     def stream_aux_data(
         self,
@@ -501,9 +934,16 @@ class Connector:
         where: dict | None = None,
         columns: str | Sequence[str] | None = None,
         chunksize: int = 100000,
+        order_by: str | Sequence[str] | None = None,
+        paginate: bool = False,
+        retries: int = 0,
+        prefetch: bool = False,
     ) -> Generator[pl.DataFrame, None, None]:
-        stmt = self.make_aux_statement(test, where=where, columns=columns)
-        if stmt is None:
+        """
+        Stream auxiliary data for a test in chunks.
+        Pagination works as for stream_main_data, ordered by seq_id and auxchl_id.
+        """
+        if self.make_aux_statement(test) is None:
             return
 
         if isinstance(columns, str):
@@ -511,42 +951,593 @@ class Connector:
         if isinstance(columns, Sequence):
             columns = list(columns)
         schema = get_data_schema(self.version, test["dev_uid"])["aux"]
+
+        if paginate:
+            yield from self._paginate(
+                self.make_aux_statement,
+                test,
+                where=where,
+                columns=columns,
+                schema=schema,
+                chunksize=chunksize,
+                order_by=["seq_id", "auxchl_id"],
+                retries=retries,
+                prefetch=prefetch,
+            )
+            return
+
+        stmt = self.make_aux_statement(
+            test, where=where, columns=columns, order_by=order_by
+        )
+        if columns is not None:
+            schema = {k: v for k, v in schema.items() if k in columns}
+        yield from self.stream(
+            stmt, chunksize=chunksize, schema=schema, cache=self.cacheable(test)
+        )
+
+    def _max_seq_id(
+        self,
+        make_statement: Callable[..., sa.Selectable | None],
+        test: dict,
+        since: int | None,
+    ) -> int | None:
+        where = {"seq_id": (since + 1, None)} if since is not None else None
+        stmt = make_statement(test, where=where, columns="seq_id")
+        if stmt is None:
+            return None
+        sub = stmt.subquery()
+        probe = self.query(sa.select(sa.func.max(sub.c.seq_id).label("seq_id")))
+        return probe["seq_id"][0]
+
+    def _is_active(self, test: dict) -> bool:
+        active = self.get_table(
+            "test",
+            columns=TEST_KEYS,
+            where={key: test[key] for key in TEST_KEYS},
+        )
+        return not active.is_empty()
+
+    def follow(
+        self,
+        test: dict,
+        interval: float = 5.0,
+        max_interval: float = 60.0,
+        since: int | None = None,
+        chunksize: int = 100000,
+        stop: threading.Event | None = None,
+    ) -> Generator[pl.DataFrame, None, None]:
+        """
+        Follow a running test, yielding labelled data of new records as they arrive.
+        New records are found with MAX(seq_id) probes on main and aux data every interval seconds.
+        The interval doubles up to max_interval while no new records arrive, and resets when they do.
+        Records up to the highest seq_id present in both main and aux data are fetched, in chunks of chunksize,
+        transformed and extended with one DataExtender, so step count and total time carry on across deltas.
+        since is the last seq_id already seen; by default the test is followed from its first record.
+        Following ends when the test is no longer active and all its records have been yielded, or when stop is set.
+        """
+        has_aux = self.make_aux_statement(test) is not None
+        columns = get_data_columns(self.version, test["dev_uid"])
+        extender = DataExtender()
+        last = since
+        delay = interval
+        while stop is None or not stop.is_set():
+            # checked before probing, so that records written before the test finished are still yielded
+            active = self._is_active(test)
+            bound = self._max_seq_id(self.make_main_statement, test, last)
+            if has_aux and bound is not None:
+                aux_bound = self._max_seq_id(self.make_aux_statement, test, last)
+                bound = min(bound, aux_bound) if aux_bound is not None else None
+
+            if bound is None:
+                if not active:
+                    return
+                logger.debug(f"No new records, next probe in {delay} s")
+                if stop is not None:
+                    stop.wait(delay)
+                else:
+                    time.sleep(delay)
+                delay = min(delay * 2, max_interval)
+                continue
+
+            delay = interval
+            where = {"seq_id": (last + 1 if last is not None else None, bound)}
+            for main in self.stream_main_data(
+                test,
+                where=where,
+                columns=columns["main"],
+                chunksize=chunksize,
+                order_by="seq_id",
+            ):
+                if main.is_empty():
+                    continue
+                aux = None
+                if has_aux:
+                    aux = self.get_aux_data(
+                        test,
+                        where={"seq_id": (main["seq_id"][0], main["seq_id"][-1])},
+                        columns=columns["aux"],
+                    )
+                yield transform_data(
+                    main,
+                    aux,
+                    self.version,
+                    test["dev_uid"],
+                    extender=extender,
+                )
+            last = bound
+        return
+
+    def _scan(
+        self,
+        stream: Callable[..., Generator[pl.DataFrame, None, None]],
+        schema: dict[str, type],
+        chunksize: int,
+    ) -> pl.LazyFrame:
+        """
+        Wrap a stream_*_data method in a LazyFrame.
+        Projections are pushed down to the query, predicates and row limits are applied to each chunk.
+        """
+        dtypes = pl.DataFrame(schema=schema).schema
+
+        def source(
+            with_columns: list[str] | None,
+            predicate: pl.Expr | None,
+            n_rows: int | None,
+            batch_size: int | None,
+        ) -> Iterator[pl.DataFrame]:
+            columns = with_columns if with_columns is not None else list(dtypes)
+            required = list(columns)
+            if predicate is not None:
+                required += predicate.meta.root_names()
+            required = list(dict.fromkeys(required)) or ["seq_id"]
+
+            remaining = n_rows
+            for chunk in stream(columns=required, chunksize=batch_size or chunksize):
+                if predicate is not None:
+                    chunk = chunk.filter(predicate)
+                chunk = chunk.select(columns)
+                if remaining is not None:
+                    chunk = chunk.head(remaining)
+                    remaining -= chunk.height
+                yield chunk
+                if remaining == 0:
+                    return
+
+        return register_io_source(source, schema=dtypes)
+
+    def scan_main_data(
+        self,
+        test: dict,
+        where: dict | None = None,
+        columns: str | Sequence[str] | None = None,
+        chunksize: int = 100000,
+    ) -> pl.LazyFrame:
+        """
+        Scan main data for a test as a LazyFrame, streamed in seq_id order when collected.
+        """
+        if isinstance(columns, str):
+            columns = [columns]
+        if isinstance(columns, Sequence):
+            columns = list(columns)
+        schema = get_data_schema(self.version, test["dev_uid"])["main"]
+        if columns is not None:
+            schema = {k: v for k, v in schema.items() if k in columns}
+
+        def stream(columns: list[str], chunksize: int):
+            return self.stream_main_data(
+                test,
+                where=where,
+                columns=columns,
+                chunksize=chunksize,
+                order_by="seq_id",
+            )
+
+        return self._scan(stream, schema=schema, chunksize=chunksize)
+
+    def scan_aux_data(
+        self,
+        test: dict,
+        where: dict | None = None,
+        columns: str | Sequence[str] | None = None,
+        chunksize: int = 100000,
+    ) -> pl.LazyFrame | None:
+        """
+        Scan auxiliary data for a test as a LazyFrame, streamed in seq_id order when collected.
+        """
+        if self.make_aux_statement(test) is None:
+            return None
+
+        if isinstance(columns, str):
+            columns = [columns]
+        if isinstance(columns, Sequence):
+            columns = list(columns)
+        schema = get_data_schema(self.version, test["dev_uid"])["aux"]
+        if columns is not None:
+            schema = {k: v for k, v in schema.items() if k in columns}
+
+        def stream(columns: list[str], chunksize: int):
+            return self.stream_aux_data(
+                test,
+                where=where,
+                columns=columns,
+                chunksize=chunksize,
+                order_by=["seq_id", "auxchl_id"],
+            )
+
+        return self._scan(stream, schema=schema, chunksize=chunksize)
+
+    def make_summary_statement(self, test: dict) -> sa.Selectable:
+        """
+        Make a SQLAlchemy statement aggregating main data of a test to one row,
+        with the row count and the min and max of each of SUMMARY_COLUMNS, across both tables in case of a union.
+        """
+        sub = self.make_main_statement(test, columns=SUMMARY_COLUMNS).subquery()
+        aggregates = [sa.func.count().label("rows")]
+        for col in SUMMARY_COLUMNS:
+            aggregates.append(sa.func.min(sub.c[col]).label(f"{col}_min"))
+            aggregates.append(sa.func.max(sub.c[col]).label(f"{col}_max"))
+        return sa.select(
+            *(sa.literal(test[key]).label(key) for key in TEST_KEYS),
+            *aggregates,
+        ).select_from(sub)
+
+    def get_test_summaries(
+        self, tests: Sequence[dict], batch_size: int = 500
+    ) -> pl.DataFrame:
+        """
+        Summarise main data of tests, one row per test in the order given:
+        row count, and min and max seq_id, cycle, step_id and test_atime.
+        Aggregates run on the server, batch_size tests to a query.
+        Summaries of finished tests, i.e. tests not in the active test table, are memoized.
+        """
+        schema = {key: int for key in TEST_KEYS}
+        schema["rows"] = int
+        for col in SUMMARY_COLUMNS:
+            dtype = datetime.datetime if col == "test_atime" else int
+            schema[f"{col}_min"] = dtype
+            schema[f"{col}_max"] = dtype
+
+        def key(test: dict) -> tuple:
+            return tuple(test[k] for k in TEST_KEYS)
+
+        with self._cache_lock:
+            summaries = {
+                key(test): self._summaries[key(test)]
+                for test in tests
+                if key(test) in self._summaries
+            }
+        missing = list(
+            {key(test): test for test in tests if key(test) not in summaries}.values()
+        )
+        self._cache_stats["summary"].hits += len(summaries)
+        self._cache_stats["summary"].misses += len(missing)
+
+        if missing:
+            active = set(self.get_table("test", columns=TEST_KEYS).iter_rows())
+            for i in range(0, len(missing), batch_size):
+                stmt = sa.union_all(
+                    *(
+                        self.make_summary_statement(test)
+                        for test in missing[i : i + batch_size]
+                    )
+                )
+                for row in self.query(stmt, schema=schema).iter_rows(named=True):
+                    summaries[key(row)] = row
+                    if key(row) not in active:
+                        with self._cache_lock:
+                            self._summaries[key(row)] = row
+
+        return pl.DataFrame([summaries[key(test)] for test in tests], schema=schema)
+
+    def get_test_summary(self, test: dict) -> dict:
+        """
+        Summarise main data of a test, see get_test_summaries().
+        """
+        return self.get_test_summaries([test]).row(0, named=True)
+
+    def make_step_statement(
+        self,
+        test: dict,
+        where: dict | None = None,
+    ) -> sa.Selectable:
+        """
+        Make a SQLAlchemy statement grouping main data of a test by cycle and step_id on the server,
+        across both tables in case of a union.
+        Selects the last seq_id of each step, and the number of records in the step as step_index, in seq_id order.
+        """
+        records = self.make_main_statement(
+            test, where=where, columns=["seq_id", "cycle", "step_id"]
+        ).subquery("records")
+        return (
+            sa.select(
+                sa.func.max(records.c.seq_id).label("seq_id"),
+                sa.func.count().label("step_index"),
+            )
+            .group_by(records.c.cycle, records.c.step_id)
+            .order_by(sa.literal_column("seq_id"))
+        )
+
+    def get_step_data(
+        self,
+        test: dict,
+        where: dict | None = None,
+        columns: str | Sequence[str] | None = None,
+    ) -> pl.DataFrame:
+        """
+        Get the last raw record of each step of a test, with the number of records in the step as step_index.
+        Steps are found with make_step_statement(), and their last records fetched by seq_id.
+        """
+        ends = self.query(
+            self.make_step_statement(test, where=where),
+            schema={"seq_id": int, "step_index": int},
+        )
+        if isinstance(columns, str):
+            columns = [columns]
+        if columns is not None:
+            columns = list(dict.fromkeys([*columns, "seq_id"]))
+        main = self.get_main_data(
+            test,
+            where={**(where or {}), "seq_id": ends["seq_id"].to_list()},
+            columns=columns,
+        )
+        return main.join(ends, on="seq_id", how="inner", maintain_order="right")
+
+    def make_extrema_statement(
+        self,
+        test: dict,
+        every: int,
+        where: dict | None = None,
+        columns: Sequence[str] = EXTREMA_COLUMNS,
+    ) -> sa.Selectable:
+        """
+        Make a SQLAlchemy statement finding the records holding the min and max of columns,
+        in buckets of every consecutive seq_id, across both tables in case of a union.
+        Each value is packed with its seq_id as value * 2**32 + seq_id, so that one MIN/MAX also yields the seq_id.
+        """
+        records = self.make_main_statement(
+            test, where=where, columns=["seq_id", *columns]
+        ).subquery("records")
+        packed = {col: records.c[col] * 2**32 + records.c.seq_id for col in columns}
+        aggregates = []
+        for col in columns:
+            aggregates.append(sa.func.min(packed[col]).label(f"{col}_min"))
+            aggregates.append(sa.func.max(packed[col]).label(f"{col}_max"))
+        return sa.select(*aggregates).group_by(records.c.seq_id // every)
+
+    def make_decimated_statement(
+        self,
+        test: dict,
+        every: int,
+        where: dict | None = None,
+        columns: str | Sequence[str] | None = None,
+        keep: Sequence[int] = (),
+    ) -> sa.Selectable:
+        """
+        Make a SQLAlchemy statement selecting main data for a test, decimated on the server.
+        Keeps records where seq_id MOD every is 0, the first record of each step (test_time = 0), and the seq_ids in keep.
+        """
+        if isinstance(columns, str):
+            columns = [columns]
+        if columns is not None:
+            columns = list(dict.fromkeys([*columns, "seq_id", "test_time"]))
+        records = self.make_main_statement(test, where=where, columns=columns).subquery(
+            "records"
+        )
+        conditions = [records.c.seq_id % every == 0, records.c.test_time == 0]
+        if keep:
+            conditions.append(records.c.seq_id.in_(list(keep)))
+        return sa.select(records).where(sa.or_(*conditions)).order_by(records.c.seq_id)
+
+    def get_decimated_data(
+        self,
+        test: dict,
+        max_points: int,
+        where: dict | None = None,
+        columns: str | Sequence[str] | None = None,
+        extrema: bool = False,
+        compact: bool = False,
+    ) -> pl.DataFrame:
+        """
+        Get main data for a test, decimated on the server to about max_points regular samples.
+        The first and last record of each step are always kept.
+        With extrema, the records holding the min and max of EXTREMA_COLUMNS in each bucket of samples are kept as well,
+        and the regular samples are thinned so that the total stays about max_points.
+        With compact, raw columns are fetched as narrower types, as for get_main_data.
+        """
+        if isinstance(columns, str):
+            columns = [columns]
+        slices = self._partition(self.make_main_statement, test, where, 1)
+        if not slices:
+            return self.get_main_data(test, where=where, columns=columns)
+        lo, hi = slices[0]
+        per_bucket = 1 + 2 * len(EXTREMA_COLUMNS) if extrema else 1
+        every = -(-(hi - lo + 1) * per_bucket // max_points)
+        if every <= 1:
+            return self.get_main_data(test, where=where, columns=columns)
+
+        keep = self.query(
+            self.make_step_statement(test, where=where), schema={"seq_id": int}
+        )["seq_id"].to_list()
+        if extrema:
+            packed = self.query(self.make_extrema_statement(test, every, where=where))
+            keep.extend(
+                int(value) % 2**32
+                for col in packed.columns
+                for value in packed[col].to_list()
+                if value is not None
+            )
+        stmt = self.make_decimated_statement(
+            test, every, where=where, columns=columns, keep=sorted(set(keep))
+        )
+        schema = get_data_schema(self.version, test["dev_uid"], compact)["main"]
         if columns is not None:
             schema = {k: v for k, v in schema.items() if k in columns}
-        yield from self.stream(stmt, chunksize=chunksize, schema=schema)
+        data = self.query(stmt, schema=schema, cache=self.cacheable(test))
+        if columns is not None:
+            data = data.select(columns)
+        return data
+
+    def catalogue_tables(self) -> list[str]:
+        """
+        Tables holding test metadata, assembled into the test list by assemble_tests().
+        """
+        raise NotImplementedError(
+            "catalogue_tables() must be implemented in subclasses"
+        )
+
+    @staticmethod
+    def assemble_tests(tables: dict[str, pl.DataFrame]) -> pl.DataFrame:
+        """
+        Assemble the test list from the tables named by catalogue_tables().
+        """
+        raise NotImplementedError("assemble_tests() must be implemented in subclasses")
 
     def get_tests(self) -> pl.DataFrame:
-        raise NotImplementedError("get_tests() must be implemented in subclasses")
+        return self.assemble_tests(
+            {table: self.get_table(table) for table in self.catalogue_tables()}
+        )
 
     def dispose(self):
-        self._engine.dispose()
+        if self._owns_engine:
+            self._engine.dispose()
         return
 
 
+def _sqlalchemy_query(
+    connector: Connector,
+    query: str | sa.TextClause | sa.Selectable,
+    schema: dict | None,
+) -> pl.DataFrame:
+    with connector.engine.connect() as conn:
+        return pl.read_database(query, conn, schema_overrides=schema)
+
+
+def _sqlalchemy_stream(
+    connector: Connector,
+    query: str | sa.TextClause | sa.Selectable,
+    schema: dict | None,
+    chunksize: int,
+) -> Generator[pl.DataFrame, None, None]:
+    with connector.engine.connect().execution_options(
+        stream_results=True, yield_per=chunksize
+    ) as conn:
+        yield from pl.read_database(
+            query,
+            conn,
+            iter_batches=True,
+            batch_size=chunksize,
+            schema_overrides=schema,
+        )
+
+
+def _connectorx_uri(connector: Connector) -> str:
+    url = connector.url.set(drivername=connector.url.get_backend_name())
+    return url.render_as_string(hide_password=False)
+
+
+def _connectorx_sql(
+    connector: Connector, query: str | sa.TextClause | sa.Selectable
+) -> str:
+    if isinstance(query, str):
+        return query
+    return connector.compile_statement(query)
+
+
+def _cast(data: pl.DataFrame, schema: dict | None) -> pl.DataFrame:
+    if schema is None:
+        return data
+    dtypes = pl.DataFrame(schema=schema).schema
+    return data.cast({col: dtypes[col] for col in data.columns if col in dtypes})
+
+
+def _connectorx_query(
+    connector: Connector,
+    query: str | sa.TextClause | sa.Selectable,
+    schema: dict | None,
+) -> pl.DataFrame:
+    import connectorx as cx
+
+    table = cx.read_sql(
+        _connectorx_uri(connector),
+        _connectorx_sql(connector, query),
+        return_type="arrow",
+    )
+    return _cast(pl.from_arrow(table), schema)  # ty:ignore[invalid-argument-type]
+
+
+def _connectorx_stream(
+    connector: Connector,
+    query: str | sa.TextClause | sa.Selectable,
+    schema: dict | None,
+    chunksize: int,
+) -> Generator[pl.DataFrame, None, None]:
+    import connectorx as cx
+
+    reader = cx.read_sql(
+        _connectorx_uri(connector),
+        _connectorx_sql(connector, query),
+        return_type="arrow_stream",
+        batch_size=chunksize,
+    )
+    for batch in reader:  # ty:ignore[not-iterable]
+        yield _cast(pl.from_arrow(batch), schema)  # ty:ignore[invalid-argument-type]
+
+
+@dataclass
+class Backend:
+    """
+    Fetches query results for a connector.
+    Attributes:
+        query (Callable): Execute a query and return a DataFrame.
+        stream (Callable): Execute a query and yield DataFrames in chunks.
+        available (Callable): Whether the backend's dependencies are installed.
+    """
+
+    query: Callable[..., pl.DataFrame]
+    stream: Callable[..., Generator[pl.DataFrame, None, None]]
+    available: Callable[[], bool] = lambda: True
+
+
+BACKENDS = {
+    # rows are built as python objects by the DBAPI driver, then converted to polars
+    "sqlalchemy": Backend(query=_sqlalchemy_query, stream=_sqlalchemy_stream),
+    # rows are decoded by connectorx straight into arrow record batches
+    "connectorx": Backend(
+        query=_connectorx_query,
+        stream=_connectorx_stream,
+        available=lambda: importlib.util.find_spec("connectorx") is not None,
+    ),
+}
+
+
 class Version0760Connector(Connector):
-    def get_tests(self) -> pl.DataFrame:
-        test = self.get_table("test")
-        h_test = self.get_table("h_test")
-        test_note = self.get_table("test_note")
+    def catalogue_tables(self) -> list[str]:
+        return ["test", "h_test", "test_note"]
+
+    @staticmethod
+    def assemble_tests(tables: dict[str, pl.DataFrame]) -> pl.DataFrame:
         tests = (
-            pl.concat([test, h_test], how="diagonal_relaxed")
-            .join(test_note, on=["dev_uid", "unit_id", "chl_id", "test_id"], how="left")
-            .sort("dev_uid", "unit_id", "chl_id", "test_id")
+            pl.concat([tables["test"], tables["h_test"]], how="diagonal_relaxed")
+            .join(tables["test_note"], on=TEST_KEYS, how="left")
+            .sort(TEST_KEYS)
         )
 
         return tests
 
 
 class Version0800Connector(Connector):
-    def get_tests(self) -> pl.DataFrame:
-        tables = [
+    def catalogue_tables(self) -> list[str]:
+        return [
             "test",
             *sorted(t for t in self.tables if t.startswith("h_test")),
         ]
+
+    @staticmethod
+    def assemble_tests(tables: dict[str, pl.DataFrame]) -> pl.DataFrame:
         tests = pl.concat(
-            [self.get_table(table) for table in tables],
+            [tables[table] for table in tables],
             how="diagonal_relaxed",
-        ).sort("dev_uid", "unit_id", "chl_id", "test_id")
+        ).sort(TEST_KEYS)
 
         return tests
 
@@ -563,25 +1554,40 @@ def connect(
     user: str | None = None,
     password: str | None = None,
     database: str | None = None,
+    cache_ttl: float | None = None,
+    engine: sa.engine.Engine | None = None,
+    url: sa.engine.URL | str | None = None,
+    engine_options: dict | None = None,
+    backend: str = "sqlalchemy",
+    result_cache: ResultCache | None = None,
 ) -> Connector:
+    """
+    Connect to the database and return the connector matching the BTS version.
+    The version is resolved on the same engine that the returned connector uses.
+    """
 
-    with Connector(
+    conn = Connector(
         host=host,
         port=port,
         user=user,
         password=password,
         database=database,
-    ) as conn:
+        cache_ttl=cache_ttl,
+        engine=engine,
+        url=url,
+        engine_options=engine_options,
+        backend=backend,
+        result_cache=result_cache,
+    )
+    try:
         version = conn.version
         if not version:
             raise ValueError("Failed to determine BTS version")
         if version not in CONNECTORS:
             raise ValueError(f"Unsupported BTS version: {version}")
+    except Exception:
+        conn.dispose()
+        raise
 
-    return CONNECTORS[version](
-        host=host,
-        port=port,
-        user=user,
-        password=password,
-        database=database,
-    )
+    conn.__class__ = CONNECTORS[version]
+    return conn
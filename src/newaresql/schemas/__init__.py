@@ -1,5 +1,7 @@
 import logging
 
+import polars as pl
+
 from newaresql.schemas import schemas_0760, schemas_0800
 
 logger = logging.getLogger(__name__)
@@ -9,12 +11,58 @@ _SCHEMAS: dict[str, dict[str, dict[str, type]]] = {
     "0800-26": {"main": schemas_0800.main_26, "aux": schemas_0800.aux_26},
 }
 
+# narrower types of raw integer columns in compact fetches, by the range of the BTS columns
+# time, current, capacity and energy may exceed 32 bits, and are kept
+COMPACT: dict[str, type] = {
+    "auxchl_id": pl.UInt16,
+    "data_flag": pl.UInt8,
+    "cycle": pl.UInt32,
+    "step_id": pl.UInt32,
+    "step_type": pl.UInt8,
+    "step_changecount": pl.UInt32,
+    "work_type": pl.UInt8,
+    "test_vol": pl.Int32,
+    "test_ir": pl.Int32,
+    "test_tmp": pl.Int32,
+    "factor_capchg": pl.UInt8,
+    "factor_engchg": pl.UInt8,
+    "factor_capdchg": pl.UInt8,
+    "factor_engdchg": pl.UInt8,
+    "step_index": pl.UInt32,
+    "run_index": pl.UInt32,
+}
+
 
-def get_data_schema(version: str, dev_uid: int) -> dict[str, dict[str, type]]:
+def get_data_schema(
+    version: str, dev_uid: int, compact: bool = False
+) -> dict[str, dict[str, type]]:
+    """
+    Schemas of main and aux data, as column names to python types.
+    With compact, raw integer columns of limited range map to narrower polars types, see COMPACT.
+    """
     logger.debug(f"Getting data schema for version {version} and device UID {dev_uid}")
 
     dev_type = str(dev_uid)[:2]
     key = f"{version}-{dev_type}"
     if key not in _SCHEMAS:
         raise ValueError(f"Unsupported version-device combination: {key}")
-    return _SCHEMAS[key]
+    if not compact:
+        return _SCHEMAS[key]
+    return {
+        kind: {
+            col: COMPACT.get(col, dtype) if dtype is int else dtype
+            for col, dtype in schema.items()
+        }
+        for kind, schema in _SCHEMAS[key].items()
+    }
+
+
+def get_data_columns(version: str, dev_uid: int) -> dict[str, list[str]]:
+    """
+    Columns of main and aux data fetched by default.
+    Temperature is taken from the aux data, and is not fetched from the main data.
+    """
+    main = [
+        col for col in get_data_schema(version, dev_uid)["main"] if col != "test_tmp"
+    ]
+    return {"main": main, "aux": ["auxchl_id", "seq_id", "test_tmp"]}
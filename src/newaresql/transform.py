@@ -1,23 +1,153 @@
+import functools
 import logging
+from typing import Callable, Iterable
 
 import polars as pl
 
+from newaresql.bdf import MAPPINGS, Frame, convert, expand, numbered, unnumbered
+
 logger = logging.getLogger(__name__)
 
 
-def _check_required(data: pl.DataFrame, expression: pl.Expr) -> bool:
+def _check_required(data: pl.DataFrame | pl.LazyFrame, expression: pl.Expr) -> bool:
     """
     Checks if all columns required by the expression are present in the DataFrame.
     Returns True if all required columns are present, False otherwise.
     """
     required = set(expression.meta.root_names())
-    return all(col in data.columns for col in required)
+    columns = data.collect_schema().names()
+    return all(col in columns for col in required)
 
 
-def _0760_main_24(data: pl.DataFrame) -> pl.DataFrame:
+def _layers(
+    expressions: dict[str, pl.Expr], columns: frozenset[str]
+) -> list[dict[str, pl.Expr]]:
     """
-    Transform the main data for version 0760-24.
+    Group expressions, evaluated in order, into layers that can each run in a single with_columns call.
+    Expressions whose required columns are missing are skipped, as with _check_required.
+    An expression is placed after the layers producing the columns it reads,
+    and not before a layer that still reads the previous value of the column it overwrites.
+    """
+    available = set(columns)
+    written: dict[str, int] = {}  # column -> layer of its last write
+    read: dict[str, int] = {}  # column -> last layer reading it
+    layers: list[dict[str, pl.Expr]] = []
+    for name, expr in expressions.items():
+        required = set(expr.meta.root_names())
+        if not required.issubset(available):
+            logger.info(
+                f"Skipping transformation of {name} column due to missing required columns"
+            )
+            continue
+        layer = max(
+            [written[col] + 1 for col in required if col in written]
+            + [read.get(name, 0)]
+            + ([written[name] + 1] if name in written else []),
+        )
+        if layer == len(layers):
+            layers.append({})
+        layers[layer][name] = expr
+        written[name] = layer
+        for col in required:
+            read[col] = max(read.get(col, 0), layer)
+        available.add(name)
+    return layers
+
+
+def _run(data: Frame, layers: list[dict[str, pl.Expr]], order: list[str]) -> Frame:
+    """
+    Run layers of expressions, and keep new columns in the given order.
+    """
+    columns = data.collect_schema().names()
+    for layer in layers:
+        data = data.with_columns(expr.alias(name) for name, expr in layer.items())
+    planned = {name for layer in layers for name in layer}
+    created = [name for name in order if name in planned and name not in columns]
+    if [
+        name for name in data.collect_schema().names() if name not in columns
+    ] != created:
+        data = data.select(*columns, *created)
+    return data
+
+
+@functools.lru_cache(maxsize=256)
+def _plan(
+    expressions: Callable[[], dict[str, pl.Expr]], columns: frozenset[str]
+) -> list[dict[str, pl.Expr]]:
+    """
+    Memoized layers of a transformation, by expression builder and available columns.
+    """
+    layers = _layers(expressions(), columns)
+    logger.info(
+        f"Planned {expressions.__name__} in {len(layers)} layers: {[list(layer) for layer in layers]}"
+    )
+    return layers
+
+
+def _transform(data: Frame, expressions: Callable[[], dict[str, pl.Expr]]) -> Frame:
+    """
+    Apply the expressions of a transformation to data, with as few with_columns calls as possible.
     """
+    columns = frozenset(data.collect_schema().names())
+    return _run(data, _plan(expressions, columns), order=list(expressions()))
+
+
+STEP_TYPES = {
+    1: "CC Charge",
+    2: "CC Discharge",
+    4: "Rest",
+    5: "Cycle",
+    6: "End",
+    7: "CC-CV Charge",
+    8: "CP Discharge",
+    9: "CP Charge",
+    10: "CR Discharge",
+    20: "CC-CV Discharge",
+}
+
+STEP_TYPE = pl.Enum([*STEP_TYPES.values(), "Unknown"])
+
+# types of transformed and extended columns in compact output, by bts name
+# the resolutions of voltage (0.1 mV), current and temperature (0.1 degC) fit in the 24-bit significand of Float32
+COMPACT: dict[str, pl.DataType] = {
+    "cycle": pl.UInt32(),
+    "step_id": pl.UInt32(),
+    "step_count": pl.UInt32(),
+    "step_index": pl.UInt32(),
+    "step_type": STEP_TYPE,
+    "test_vol": pl.Float32(),
+    "test_cur": pl.Float32(),
+    "test_tmp": pl.Float32(),
+}
+
+
+def _lookup(key: pl.Expr, compute: Callable[[pl.Expr], pl.Expr]) -> pl.Expr:
+    """
+    Evaluate compute once per run of equal values of key, and broadcast the results back to each row of the run.
+    A struct key looks up combinations of columns.
+    """
+    # compute is evaluated on the small frame of run values, in a single pass
+    values = (
+        key.rle()
+        .struct.field("value")
+        .map_batches(
+            lambda keys: keys.to_frame().select(compute(pl.col(keys.name))).to_series()
+        )
+    )
+    return values.gather(key.rle_id())
+
+
+def _0760_d_cur_step_range(cur_step_range: pl.Expr) -> pl.Expr:
+    return (
+        pl.when(cur_step_range.abs().is_between(0, 999999, closed="right"))
+        .then(cur_step_range.abs())
+        .when(cur_step_range.abs().is_between(1000000, 999999999, closed="both"))
+        .then(cur_step_range // 1000000000.0)
+        .otherwise(0)
+    )
+
+
+def _0760_scale_cur(cur_step_range: pl.Expr) -> pl.Expr:
     CUR_SCALE_10 = 10
     CUR_SCALE_100 = 100
     CUR_SCALE_1000 = 1000
@@ -27,41 +157,9 @@ def _0760_main_24(data: pl.DataFrame) -> pl.DataFrame:
     CUR_SCALE_FACTOR_1000 = 100.0
     CUR_SCALE_FACTOR_MAX = 10.0
 
-    step_type_mapping = {
-        1: "CC Charge",
-        2: "CC Discharge",
-        4: "Rest",
-        5: "Cycle",
-        6: "End",
-        7: "CC-CV Charge",
-        8: "CP Discharge",
-        9: "CP Charge",
-        10: "CR Discharge",
-        20: "CC-CV Discharge",
-    }
-
-    # pre-define column variables for use in expressions
-    cur_step_range = pl.col("cur_step_range")
-    d_cur_step_range = pl.col("d_cur_step_range")
-    scale_cur = pl.col("scale_cur")
-    scale_capchg = pl.col("scale_capchg")
-    scale_capdchg = pl.col("scale_capdchg")
-    scale_engchg = pl.col("scale_engchg")
-    scale_engdchg = pl.col("scale_engdchg")
-    factor_engchg = pl.col("factor_engchg")
-    factor_engdchg = pl.col("factor_engdchg")
-    factor_capchg = pl.col("factor_capchg")
-    factor_capdchg = pl.col("factor_capdchg")
-
-    expressions = {
-        "d_cur_step_range": pl.when(
-            cur_step_range.abs().is_between(0, 999999, closed="right")
-        )
-        .then(cur_step_range.abs())
-        .when(cur_step_range.abs().is_between(1000000, 999999999, closed="both"))
-        .then(cur_step_range // 1000000000.0)
-        .otherwise(0),
-        "scale_cur": pl.when(cur_step_range > 0)
+    d_cur_step_range = _0760_d_cur_step_range(cur_step_range)
+    return (
+        pl.when(cur_step_range > 0)
         .then(
             pl.when(cur_step_range < CUR_SCALE_10)
             .then(CUR_SCALE_FACTOR_10)
@@ -85,31 +183,50 @@ def _0760_main_24(data: pl.DataFrame) -> pl.DataFrame:
             .when(d_cur_step_range < 1000)
             .then(1000.0)
             .otherwise(100)
-        ),
-        "scale_capchg": pl.when(factor_capchg == 0)
-        .then(scale_cur * 1e3 * 3600)
-        .when(factor_capchg == 1)
-        .then(scale_cur)
-        .when(factor_capchg == 2)
-        .then(scale_cur * 1e3),
-        "scale_capdchg": pl.when(factor_capdchg == 0)
-        .then(scale_cur * 1e3 * 3600)
-        .when(factor_capdchg == 1)
-        .then(scale_cur)
-        .when(factor_capdchg == 2)
-        .then(scale_cur * 1e3),
-        "scale_engchg": pl.when(factor_engchg == 0)
-        .then(scale_cur * 1e3 * 3600)
-        .when(factor_engchg == 1)
-        .then(scale_cur)
-        .when(factor_engchg == 2)
-        .then(scale_cur * 1e3),
-        "scale_engdchg": pl.when(factor_engdchg == 0)
+        )
+    )
+
+
+def _0760_scale_accumulated(factor: pl.Expr, scale_cur: pl.Expr) -> pl.Expr:
+    return (
+        pl.when(factor == 0)
         .then(scale_cur * 1e3 * 3600)
-        .when(factor_engdchg == 1)
+        .when(factor == 1)
         .then(scale_cur)
-        .when(factor_engdchg == 2)
-        .then(scale_cur * 1e3),
+        .when(factor == 2)
+        .then(scale_cur * 1e3)
+    )
+
+
+def _0760_main_24_expressions() -> dict[str, pl.Expr]:
+    """
+    Expressions transforming the main data for version 0760-24, in order of evaluation.
+    Scale columns are constant within a step, so they are evaluated once per run of cur_step_range and factor, see _lookup.
+    """
+    # pre-define column variables for use in expressions
+    cur_step_range = pl.col("cur_step_range")
+    scale_cur = pl.col("scale_cur")
+    scale_capchg = pl.col("scale_capchg")
+    scale_capdchg = pl.col("scale_capdchg")
+    scale_engchg = pl.col("scale_engchg")
+    scale_engdchg = pl.col("scale_engdchg")
+
+    def scale_accumulated(factor: str) -> pl.Expr:
+        return _lookup(
+            pl.struct(cur_step_range, factor),
+            lambda keys: _0760_scale_accumulated(
+                keys.struct.field(factor),
+                _0760_scale_cur(keys.struct.field("cur_step_range")),
+            ),
+        )
+
+    expressions = {
+        "d_cur_step_range": _lookup(cur_step_range, _0760_d_cur_step_range),
+        "scale_cur": _lookup(cur_step_range, _0760_scale_cur),
+        "scale_capchg": scale_accumulated("factor_capchg"),
+        "scale_capdchg": scale_accumulated("factor_capdchg"),
+        "scale_engchg": scale_accumulated("factor_engchg"),
+        "scale_engdchg": scale_accumulated("factor_engdchg"),
         "test_time": pl.col("test_time") / 1e3,
         "test_vol": pl.col("test_vol") / 1e4,
         "test_cur": pl.col("test_cur") / (scale_cur * 1e3),
@@ -122,23 +239,20 @@ def _0760_main_24(data: pl.DataFrame) -> pl.DataFrame:
         "test_cap": pl.col("test_capchg") - pl.col("test_capdchg"),
         "test_eng": pl.col("test_engchg") - pl.col("test_engdchg"),
         "unix_time": pl.col("test_atime").dt.epoch("s"),
-        "step_type": pl.col("step_type").replace_strict(
-            step_type_mapping, default="Unknown"
-        ),
+        "step_type": pl.col("step_type").replace_strict(STEP_TYPES, default="Unknown"),
     }
 
-    for name, expr in expressions.items():
-        if _check_required(data, expr):
-            logger.info(f"Transforming data with {name} column")
-            data = data.with_columns(expr.alias(name))
-        else:
-            logger.info(
-                f"Skipping transformation of {name} column due to missing required columns"
-            )
-    return data
+    return expressions
+
+
+def _0760_main_24(data: Frame) -> Frame:
+    """
+    Transform the main data for version 0760-24.
+    """
+    return _transform(data, _0760_main_24_expressions)
 
 
-def _0760_aux_24(data: pl.DataFrame) -> pl.DataFrame:
+def _0760_aux_24(data: Frame) -> Frame:
     """
     Transform the auxiliary data for version 0760-24.
     """
@@ -148,14 +262,14 @@ def _0760_aux_24(data: pl.DataFrame) -> pl.DataFrame:
     return data.with_columns(**expressions)
 
 
-def _0800_main_24(data: pl.DataFrame) -> pl.DataFrame:
+def _0800_main_24(data: Frame) -> Frame:
     """
     Transform the main data for version 0800-24.
     """
     return _0760_main_24(data)
 
 
-def _0800_aux_24(data: pl.DataFrame) -> pl.DataFrame:
+def _0800_aux_24(data: Frame) -> Frame:
     """
     Transform the auxiliary data for version 0800-24.
     """
@@ -165,23 +279,10 @@ def _0800_aux_24(data: pl.DataFrame) -> pl.DataFrame:
     return data.with_columns(**expressions)
 
 
-def _0800_main_26(data: pl.DataFrame) -> pl.DataFrame:
+def _0800_main_26_expressions() -> dict[str, pl.Expr]:
     """
-    Transform the main data for version 0800-26.
+    Expressions transforming the main data for version 0800-26, in order of evaluation.
     """
-    step_type_mapping = {
-        1: "CC Charge",
-        2: "CC Discharge",
-        4: "Rest",
-        5: "Cycle",
-        6: "End",
-        7: "CC-CV Charge",
-        8: "CP Discharge",
-        9: "CP Charge",
-        10: "CR Discharge",
-        20: "CC-CV Discharge",
-    }
-
     expressions = {
         "test_time": pl.col("test_time") / 1e3,
         "test_vol": pl.col("test_vol") / 1e4,
@@ -197,22 +298,19 @@ def _0800_main_26(data: pl.DataFrame) -> pl.DataFrame:
         "test_cap": pl.col("test_capchg") - pl.col("test_capdchg"),
         "test_eng": pl.col("test_engchg") - pl.col("test_engdchg"),
         "unix_time": pl.col("test_atime").dt.epoch("s"),
-        "step_type": pl.col("step_type").replace_strict(
-            step_type_mapping, default="Unknown"
-        ),
+        "step_type": pl.col("step_type").replace_strict(STEP_TYPES, default="Unknown"),
     }
-    for name, expr in expressions.items():
-        if _check_required(data, expr):
-            logger.info(f"Transforming data with {name} column")
-            data = data.with_columns(expr.alias(name))
-        else:
-            logger.info(
-                f"Skipping transformation of {name} column due to missing required columns"
-            )
-    return data
+    return expressions
 
 
-def _0800_aux_26(data: pl.DataFrame) -> pl.DataFrame:
+def _0800_main_26(data: Frame) -> Frame:
+    """
+    Transform the main data for version 0800-26.
+    """
+    return _transform(data, _0800_main_26_expressions)
+
+
+def _0800_aux_26(data: Frame) -> Frame:
     """
     Transform the auxiliary data for version 0800-26.
     """
@@ -234,47 +332,269 @@ AUX_TRANSFORMATIONS = {
     "0800-26": _0800_aux_26,
 }
 
+MAIN_EXPRESSIONS = {
+    "0760-24": _0760_main_24_expressions,
+    "0800-24": _0760_main_24_expressions,
+    "0800-26": _0800_main_26_expressions,
+}
+
+
+@functools.cache
+def _compact_expressions(
+    expressions: Callable[[], dict[str, pl.Expr]],
+) -> Callable[[], dict[str, pl.Expr]]:
+    """
+    Expressions of a transformation, with step types mapped straight to STEP_TYPE instead of strings.
+    """
+
+    def compact() -> dict[str, pl.Expr]:
+        return {
+            **expressions(),
+            "step_type": pl.col("step_type").replace_strict(
+                STEP_TYPES, default="Unknown", return_dtype=STEP_TYPE
+            ),
+        }
+
+    compact.__name__ = f"{expressions.__name__}_compact"
+    return compact
 
-def transform_main(data: pl.DataFrame, version: str, dev_uid: int) -> pl.DataFrame:
+
+def compact_data(data: Frame) -> Frame:
+    """
+    Cast transformed data to the compact types of COMPACT, by bts name. Numbered columns are cast as their field.
+    """
+    dtypes = {}
+    for name, dtype in data.collect_schema().items():
+        base, _ = unnumbered(name, "bts")
+        if base in COMPACT and dtype != COMPACT[base]:
+            dtypes[name] = COMPACT[base]
+    return data.cast(dtypes) if dtypes else data
+
+
+def transform_main(
+    data: Frame, version: str, dev_uid: int, compact: bool = False
+) -> Frame:
     """
     Transform the main data based on the version and device UID.
+    With compact, counters, measurements and step types are cast to the narrower types of COMPACT.
     """
     dev_type = str(dev_uid)[:2]
     key = f"{version}-{dev_type}"
     if key not in MAIN_TRANSFORMATIONS:
         raise ValueError(f"Unsupported version-device combination: {key}")
-    return MAIN_TRANSFORMATIONS[key](data)
+    if not compact:
+        return MAIN_TRANSFORMATIONS[key](data)
+    data = _transform(data, _compact_expressions(MAIN_EXPRESSIONS[key]))
+    return compact_data(data)
 
 
-def transform_aux(data: pl.DataFrame, version: str, dev_uid: int) -> pl.DataFrame:
+def transform_aux(
+    data: Frame, version: str, dev_uid: int, compact: bool = False
+) -> Frame:
     """
     Transform the auxiliary data based on the version and device UID.
+    With compact, temperature is cast to Float32, as for transform_main.
     """
     dev_type = str(dev_uid)[:2]
     key = f"{version}-{dev_type}"
     if key not in AUX_TRANSFORMATIONS:
         raise ValueError(f"Unsupported version-device combination: {key}")
-    return AUX_TRANSFORMATIONS[key](data)
+    data = AUX_TRANSFORMATIONS[key](data)
+    return compact_data(data) if compact else data
+
+
+class DataExtender:
+    """
+    Calculates step count, step index and total time chunk by chunk, carrying state between chunks.
+    Chunks must be passed in seq_id order, i.e. as streamed from the database.
+    The output of all chunks concatenated is identical to extend_data on the concatenated chunks,
+    provided the first chunk holds the earliest unix_time, as is the case for time-ordered data.
+    Attributes:
+        step_count (int): Step count of the last row seen.
+        step_start (int | None): First seq_id of the last step seen.
+        start_time (int | None): Earliest unix_time seen.
+    """
+
+    def __init__(self):
+        self.step_count: int = 0
+        self.step_start: int | None = None
+        self.start_time: int | None = None
+
+    def _expressions(self) -> dict[str, pl.Expr]:
+        step_start = pl.col("seq_id").min().over("step_count")
+        if self.step_start is not None:
+            # the first step in the chunk may continue the last step of the previous chunk
+            step_start = (
+                pl.when(pl.col("step_count") == self.step_count)
+                .then(pl.min_horizontal(step_start, pl.lit(self.step_start)))
+                .otherwise(step_start)
+            )
+        start_time = pl.col("unix_time").min()
+        if self.start_time is not None:
+            start_time = pl.min_horizontal(start_time, pl.lit(self.start_time))
+
+        return {
+            "step_count": pl.when(pl.col("test_time") == 0)
+            .then(1)
+            .otherwise(0)
+            .cum_sum()
+            + self.step_count,
+            "step_index": pl.col("seq_id") - step_start + 1,
+            "test_totaltime": pl.col("unix_time") - start_time,
+        }
+
+    def _update(self, data: pl.DataFrame):
+        if data.is_empty():
+            return
+        if "step_count" in data.columns:
+            self.step_count = data["step_count"][-1]
+        if "step_index" in data.columns:
+            self.step_start = data["seq_id"][-1] - data["step_index"][-1] + 1
+        if "unix_time" in data.columns:
+            start_time = data["unix_time"].min()
+            if start_time is not None and (
+                self.start_time is None or start_time < self.start_time
+            ):
+                self.start_time = start_time  # ty:ignore[invalid-assignment]
+        return
 
+    def extend(self, data: Frame) -> Frame:
+        """
+        Extend the next chunk of data, and carry the state on to the next call.
+        A LazyFrame is extended as a single chunk, and does not update the state.
+        """
+        expressions = self._expressions()
+        columns = frozenset(data.collect_schema().names())
+        data = _run(data, _layers(expressions, columns), order=list(expressions))
+        if isinstance(data, pl.DataFrame):
+            self._update(data)
+        return data
 
-def extend_data(data: pl.DataFrame) -> pl.DataFrame:
+
+def extend_data(data: Frame) -> Frame:
     """
     Calculates additional columns based on existing data, such as power, step count, step index, and Unix time.
     It's advised to only enrich full datasets, as the step count and step index calculations rely on the entire dataset to be accurate.
+    Use DataExtender to enrich data chunk by chunk.
     """
-    expressions = {
-        "step_count": pl.when(pl.col("test_time") == 0).then(1).otherwise(0).cum_sum(),
-        "step_index": (pl.col("seq_id") - pl.col("seq_id").min() + 1).over(
-            "step_count"
-        ),
-        "test_totaltime": (pl.col("unix_time") - pl.col("unix_time").min()),
-    }
-    for name, expr in expressions.items():
-        if _check_required(data, expr):
-            logger.info(f"Enriching data with {name} column")
-            data = data.with_columns(expr.alias(name))
-        else:
-            logger.info(
-                f"Skipping enrichment of {name} column due to missing required columns"
+    return DataExtender().extend(data)
+
+
+def required_columns(columns: Iterable[str], version: str, dev_uid: int) -> set[str]:
+    """
+    Raw columns required to produce the given transformed or extended columns.
+    Walks the main transformation and extension expressions backwards, from the requested columns to their root columns.
+    """
+    dev_type = str(dev_uid)[:2]
+    key = f"{version}-{dev_type}"
+    if key not in MAIN_EXPRESSIONS:
+        raise ValueError(f"Unsupported version-device combination: {key}")
+
+    expressions = [
+        *MAIN_EXPRESSIONS[key]().items(),
+        *DataExtender()._expressions().items(),
+    ]
+    required = set(columns)
+    for name, expr in reversed(expressions):
+        if name in required:
+            required.discard(name)
+            required.update(expr.meta.root_names())
+    return required
+
+
+def _sorted_by_seq_id(data: Frame) -> Frame:
+    """
+    Sort eager data by seq_id unless already sorted, and flag it as sorted for merge joins.
+    Lazy data is left as is.
+    """
+    if isinstance(data, pl.LazyFrame):
+        return data
+    if not data["seq_id"].is_sorted():
+        data = data.sort("seq_id")
+    return data.with_columns(pl.col("seq_id").set_sorted())
+
+
+def pivot_aux(data: Frame) -> Frame:
+    """
+    Pivot aux data to one row per seq_id, with a numbered column per aux channel, e.g. test_tmp_1 and test_tmp_2.
+    Aux data of a single channel keeps unnumbered columns.
+    Lazy data is collected once to find its channels.
+    """
+    channels = data.select(pl.col("auxchl_id").unique().sort())
+    if isinstance(channels, pl.LazyFrame):
+        channels = channels.collect()
+    channels = channels["auxchl_id"].drop_nulls().to_list()
+    if len(channels) <= 1:
+        return data.drop("auxchl_id")
+
+    values = [
+        col
+        for col in data.collect_schema().names()
+        if col not in ("seq_id", "auxchl_id")
+    ]
+    pivoted = None
+    for channel in channels:
+        part = _sorted_by_seq_id(
+            data.filter(pl.col("auxchl_id") == channel).select(
+                "seq_id",
+                *(pl.col(col).alias(numbered(col, channel, "bts")) for col in values),
             )
-    return data
+        )
+        pivoted = (
+            part
+            if pivoted is None
+            else pivoted.join(part, on="seq_id", how="full", coalesce=True)
+        )
+    return _sorted_by_seq_id(pivoted)
+
+
+def join_aux(main: Frame, aux: Frame) -> Frame:
+    """
+    Join pivoted aux data onto main data by seq_id, keeping one row per main record.
+    Eager data is sorted by seq_id if needed, so that polars can merge the sorted keys rather than hash them.
+    """
+    return _sorted_by_seq_id(main).join(
+        _sorted_by_seq_id(aux), on="seq_id", how="left", maintain_order="left"
+    )
+
+
+def transform_data(
+    main: Frame,
+    aux: Frame | None,
+    version: str,
+    dev_uid: int,
+    extender: DataExtender | None = None,
+    fields: list[str] | None = None,
+    extend: bool = True,
+    compact: bool = False,
+) -> Frame:
+    """
+    Transform, join, extend and label main and aux data.
+    Aux data of several channels is pivoted to numbered columns, e.g. "Temperature 1 / degC", so there is one row per main record.
+    Data is extended with the given extender when processed in chunks, and with extend_data otherwise.
+    With extend=False, extended columns are expected in main data, e.g. per-step data from Connector.get_step_data().
+    fields selects a subset of the labelled columns, in the given order. All labelled columns are selected by default.
+    With compact, counters, step types and measurements are narrowed, see COMPACT.
+    """
+    main = transform_main(main, version, dev_uid, compact)
+    if aux is not None:
+        aux = transform_aux(aux, version, dev_uid, compact)
+
+    if aux is not None:
+        data = join_aux(main, pivot_aux(aux))
+    else:
+        data = main.with_columns(test_tmp=pl.lit(None, dtype=pl.Float64))
+    if extend:
+        data = extender.extend(data) if extender is not None else extend_data(data)
+    if compact:
+        data = compact_data(data)
+
+    columns = MAPPINGS.get(("bts", "label"))
+    if columns is None:
+        raise ValueError("Invalid mapping from 'bts' to 'label'")
+
+    data = convert(data, src="bts", dst="label")
+    # fields of several aux channels are only available numbered
+    return data.select(
+        expand(fields or columns.values(), data.collect_schema().names())
+    )
@@ -0,0 +1,18 @@
+import pytest
+
+import newaresql
+from standin import build
+
+
+@pytest.fixture(scope="session")
+def bts_url(tmp_path_factory) -> str:
+    """
+    Stand-in database with two aux channels.
+    """
+    return build(tmp_path_factory.mktemp("bts") / "bts.db", aux_channels=2)
+
+
+@pytest.fixture
+def connector(bts_url):
+    with newaresql.connect(url=bts_url) as conn:
+        yield conn
@@ -0,0 +1,116 @@
+"""
+SQLite stand-in for a BTS database, with the tables and columns read by the connector.
+Test 1 is finished (listed in h_test), test 2 is active (listed in test).
+"""
+
+import datetime
+import random
+from pathlib import Path
+
+import sqlalchemy as sa
+
+MAIN_COLUMNS = """unit_id integer, chl_id integer, test_id integer, seq_id integer, cycle integer, step_id integer,
+step_type integer, step_changecount integer, work_type integer, test_time integer, test_vol integer, test_cur integer,
+test_ir integer, test_tmp integer, factor_capchg integer, test_capchg integer, factor_engchg integer, test_engchg integer,
+factor_capdchg integer, test_capdchg integer, factor_engdchg integer, test_engdchg integer, cur_step_range integer,
+test_atime datetime, dataupdate datetime"""
+
+AUX_COLUMNS = """unit_id integer, chl_id integer, auxchl_id integer, data_flag integer, test_id integer, seq_id integer,
+cycle integer, step_id integer, step_type integer, step_changecount integer, work_type integer, test_time integer,
+test_vol integer, test_cur integer, test_ir integer, test_tmp integer, test_capchg integer, test_engchg integer,
+test_capdchg integer, test_engdchg integer, cur_step_range integer, test_atime datetime, dataupdate datetime"""
+
+TEST_COLUMNS = """dev_uid integer, unit_id integer, chl_id integer, test_id integer, main_first_table text,
+main_second_table text, aux_first_table text, aux_second_table text, start_time datetime, barcode text"""
+
+
+def build(
+    path: str | Path,
+    n: int = 5000,
+    version: str = "0800",
+    aux_channels: int = 1,
+    aux_start: dict[int, int] | None = None,
+    aux_until: int | None = None,
+    dev_uid: int = 240001,
+    seed: int = 0,
+) -> str:
+    """
+    Build a stand-in database of two tests of n records each, and return its URL.
+    Aux channel c has records from seq_id aux_start[c] (default 1) up to aux_until (default n).
+    """
+    aux_start = aux_start or {}
+    rnd = random.Random(seed)
+    engine = sa.create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("create table db_ver (version text)")
+        conn.exec_driver_sql(f"insert into db_ver values ('{version}')")
+        conn.exec_driver_sql(f"create table test ({TEST_COLUMNS})")
+        conn.exec_driver_sql(f"create table h_test ({TEST_COLUMNS})")
+        conn.exec_driver_sql(
+            "create table test_note (dev_uid integer, unit_id integer, chl_id integer, test_id integer, note text)"
+        )
+        conn.exec_driver_sql(f"create table main_a ({MAIN_COLUMNS})")
+        conn.exec_driver_sql(f"create table main_b ({MAIN_COLUMNS})")
+        conn.exec_driver_sql(f"create table aux_a ({AUX_COLUMNS})")
+        t0 = datetime.datetime(2026, 1, 1)
+        for test_id, (table, active) in enumerate(
+            [("main_a", False), ("main_b", True)], start=1
+        ):
+            tests = "test" if active else "h_test"
+            conn.exec_driver_sql(
+                f"insert into {tests} values ({dev_uid}, 1, 1, {test_id}, '{table}', NULL, 'aux_a', NULL, "
+                f"'2026-01-0{test_id} 00:00:00', 'BC{test_id}')"
+            )
+            conn.exec_driver_sql(
+                f"insert into test_note values ({dev_uid}, 1, 1, {test_id}, 'note {test_id}')"
+            )
+            rows, aux_rows = [], []
+            step, step_time, cycle = 1, 0, 1
+            cur_step_range = 5
+            for seq in range(1, n + 1):
+                if rnd.random() < 0.01 or seq == 1:
+                    step += 1
+                    step_time = 0
+                    cur_step_range = rnd.choice([5, 50, 500, 5000, -1])
+                    if step % 4 == 0:
+                        cycle += 1
+                else:
+                    step_time += 1000
+                step_type = [1, 2, 4, 7][step % 4]
+                t = t0 + datetime.timedelta(seconds=seq)
+                rows.append(
+                    (1, 1, test_id, seq, cycle, step % 10, step_type, 0, 0, step_time,
+                     36000 + rnd.randint(-500, 500), rnd.randint(-5000, 5000), 0, 0,
+                     rnd.choice([0, 1, 2]), seq * 10, 1, seq * 30, 2, seq * 5, 0, seq * 7,
+                     cur_step_range, t, t)
+                )  # fmt: skip
+                for channel in range(1, aux_channels + 1):
+                    if seq < aux_start.get(channel, 1) or seq > (aux_until or n):
+                        continue
+                    aux_rows.append(
+                        (1, 1, channel, 0, test_id, seq, cycle, step % 10, step_type, 0, 0, step_time,
+                         0, 0, 0, 250 + rnd.randint(-10, 10) + 10 * channel, 0, 0, 0, 0, 0, t, t)
+                    )  # fmt: skip
+            conn.exec_driver_sql(
+                f"insert into {table} values ({','.join('?' * 25)})", rows
+            )
+            if aux_rows:
+                conn.exec_driver_sql(
+                    f"insert into aux_a values ({','.join('?' * 23)})", aux_rows
+                )
+    engine.dispose()
+    return f"sqlite:///{path}"
+
+
+def finish(url: str, test_id: int):
+    """
+    Move a test from the active test table to h_test.
+    """
+    engine = sa.create_engine(url)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            f"insert into h_test select * from test where test_id = {test_id}"
+        )
+        conn.exec_driver_sql(f"delete from test where test_id = {test_id}")
+    engine.dispose()
+    return
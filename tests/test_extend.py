@@ -0,0 +1,39 @@
+import random
+
+import polars as pl
+import pytest
+
+from newaresql.transform import DataExtender, extend_data
+
+
+def _data(n: int, seed: int) -> pl.DataFrame:
+    rnd = random.Random(seed)
+    test_time, t = [], 0
+    for i in range(n):
+        # steps of random length, some of a single record
+        t = 0 if i == 0 or rnd.random() < 0.05 else t + 1000
+        test_time.append(t)
+    return pl.DataFrame(
+        {
+            "seq_id": range(1, n + 1),
+            "test_time": test_time,
+            "unix_time": [1_700_000_000 + i for i in range(n)],
+        }
+    )
+
+
+def _chunks(data: pl.DataFrame, seed: int) -> list[pl.DataFrame]:
+    rnd = random.Random(seed)
+    bounds = sorted(rnd.sample(range(1, data.height), rnd.randint(1, 20)))
+    # empty and single-record chunks included
+    bounds = sorted(bounds + [bounds[0], bounds[-1] - 1])
+    edges = [0, *bounds, data.height]
+    return [data[a:b] for a, b in zip(edges[:-1], edges[1:])]
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_chunked_extension_equals_whole_frame(seed):
+    data = _data(random.Random(seed).randint(2, 2000), seed)
+    extender = DataExtender()
+    chunked = pl.concat([extender.extend(chunk) for chunk in _chunks(data, seed)])
+    assert chunked.equals(extend_data(data))